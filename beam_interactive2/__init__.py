@@ -1,17 +1,32 @@
+import time
+
 from .connection import *
 from .encoding import *
+from .codec import *
+from .adaptive import AdaptiveCompression
+from .transport import PerMessageDeflate
+from .messages import Message, ButtonInput, JoystickInput, Participant, \
+    ParticipantJoin, ParticipantLeave, ParticipantUpdate, ControlUpdate
 from .scene import *
 from .state import *
 from .keycodes import keycode
 from ._util import until_event
 from .discovery import *
+from .capture import PacketCapture
+from .dispatch import DispatchEmitter
+from .recording import Recorder, ReplaySocket, read_recording
 
 async def create(config):
-    """Helper function for the creation of connections."""
+    """Helper function for the creation of connections. The returned state
+    is bootstrapped, and its startup_timings include authentication."""
+    start = time.perf_counter()
     handle = Auth(config)
     handle.authenticate()
+    auth_time = time.perf_counter() - start
     connection = await State.connect(
             authorization = "Bearer {}".format(handle.oauth_info["access_token"]),
             project_version_id = config.version_id)
-    await connection.sync_time()
+    connection.startup_timings['auth'] = auth_time
+    connection.startup_timings.move_to_end('auth', last=False)
+    await connection.bootstrap()
     return connection
\ No newline at end of file
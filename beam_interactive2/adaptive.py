@@ -0,0 +1,246 @@
+import asyncio
+import time
+
+from .capture import SEND
+from .encoding import TextEncoding, GzipEncoding
+from .log import logger
+
+
+class Sample:
+    """Sample accumulates the frames seen through one scheme in a window."""
+
+    def __init__(self):
+        self.text_bytes = 0
+        self.wire_bytes = 0
+        self.seconds = 0.0
+
+    def add(self, text_bytes, wire_bytes, seconds):
+        self.text_bytes += text_bytes
+        self.wire_bytes += wire_bytes
+        self.seconds += seconds
+
+    @property
+    def ratio(self):
+        """The wire size as a fraction of the text size."""
+        return self.wire_bytes / self.text_bytes
+
+    @property
+    def cost(self):
+        """Seconds of CPU spent per byte of text."""
+        return self.seconds / self.text_bytes
+
+
+class AdaptiveCompression:
+    """
+    AdaptiveCompression switches a Connection between plain text and the
+    compressed ``schemes`` at runtime, based on what compression actually
+    saves and costs on it. Pass it to the connection to enable it::
+
+        connection = Connection(..., compression_policy=AdaptiveCompression())
+
+    Every frame the connection encodes or decodes is sampled for its size
+    and the time spent on it. Schemes other than the current one are
+    estimated by compressing every ``trial_every``th frame with a scratch
+    stream. Once per ``window`` frames, each scheme's saving and its share
+    of the event loop's time, at the current throughput, are compared:
+
+     - a compressed scheme is used only while it saves at least
+       ``min_saving`` of the bytes and takes at most ``max_cpu_share`` of
+       the loop;
+     - to switch to a scheme, it has to beat those limits, or the current
+       scheme's size, by a further ``hysteresis``;
+     - and the same switch has to be chosen in ``patience`` windows in a row.
+
+    Switches go through ``Connection.set_compression``. Each one is logged,
+    counted in ``stats['compression_switches']``, appended to ``switches``
+    as a (timestamp, from, to, reason) tuple, and passed to the handlers
+    registered with ``add_switch_handler``. Schemes the server refuses
+    aren't tried again.
+    """
+
+    def __init__(self, schemes=(GzipEncoding,), min_saving=0.25,
+                 max_cpu_share=0.05, hysteresis=0.1, window=256, patience=2,
+                 trial_every=8):
+        self.schemes = {scheme().name(): scheme for scheme in schemes}
+        self.min_saving = min_saving
+        self.max_cpu_share = max_cpu_share
+        self.hysteresis = hysteresis
+        self.window = window
+        self.patience = patience
+        self.trial_every = trial_every
+        self.switches = []
+        self._connection = None
+        self._handlers = []
+        self._refused = set()
+        self._switching = False
+        self._pending = None
+        self._pending_count = 0
+        self._reset()
+
+    def attach(self, connection):
+        """Called by the Connection this policy is given to."""
+        self._connection = connection
+        self._reset()
+
+    def add_switch_handler(self, handler):
+        """
+        Registers a function to be called with the (timestamp, from, to,
+        reason) tuple of each switch.
+        """
+        self._handlers.append(handler)
+
+    def _reset(self):
+        self._samples = {}
+        self._trials = {}
+        self._frames = 0
+        self._text_bytes = 0
+        self._window_started = time.perf_counter()
+
+    def _trial(self, name):
+        """
+        Returns the scratch (sender, receiver's encoder, receiver) streams
+        used to estimate a scheme we aren't using.
+        """
+        trial = self._trials.get(name)
+        if trial is None:
+            scheme = self.schemes[name]
+            trial = self._trials[name] = (scheme(), scheme(), scheme())
+        return trial
+
+    def observe(self, direction, text, wire, seconds):
+        """
+        Samples a frame the connection encoded or decoded.
+
+        :param direction: Either SEND or RECV
+        :type direction: str
+        :param text: The frame's JSON text
+        :type text: str
+        :param wire: The frame as sent or received
+        :param seconds: Time spent encoding or decoding it
+        :type seconds: float
+        """
+        current = self._connection._encoding.name()
+        sample = self._samples.get(current)
+        if sample is None:
+            sample = self._samples[current] = Sample()
+        sample.add(len(text), len(wire), seconds)
+        self._text_bytes += len(text)
+        self._frames += 1
+
+        if self._frames % self.trial_every == 0:
+            for name in self.schemes:
+                if name != current and name not in self._refused:
+                    self._sample_trial(name, direction, text)
+
+        if self._frames >= self.window:
+            self._evaluate(current)
+            self._reset()
+
+    def _sample_trial(self, name, direction, text):
+        sender, receiver_encoder, receiver = self._trial(name)
+        if direction == SEND:
+            start = time.perf_counter()
+            wire = sender.encode(text)
+            seconds = time.perf_counter() - start
+        else:
+            wire = receiver_encoder.encode(text)
+            start = time.perf_counter()
+            receiver.decode(wire)
+            seconds = time.perf_counter() - start
+
+        sample = self._samples.get(name)
+        if sample is None:
+            sample = self._samples[name] = Sample()
+        sample.add(len(text), len(wire), seconds)
+
+    def _estimates(self):
+        """
+        Returns each scheme's (ratio, share of loop time) in this window.
+        """
+        elapsed = max(time.perf_counter() - self._window_started, 1e-6)
+        throughput = self._text_bytes / elapsed
+        estimates = {'text': (1.0, 0.0)}
+        for name, sample in self._samples.items():
+            if name != 'text' and sample.text_bytes > 0:
+                estimates[name] = (sample.ratio, sample.cost * throughput)
+        return estimates
+
+    def _acceptable(self, estimate, margin):
+        ratio, share = estimate
+        return 1 - ratio >= self.min_saving + margin and \
+            share <= self.max_cpu_share * (1 - margin)
+
+    def _evaluate(self, current):
+        estimates = self._estimates()
+        if current not in estimates:
+            return
+
+        candidates = [name for name in estimates
+                      if name != 'text' and name != current and
+                      name not in self._refused and
+                      self._acceptable(estimates[name], self.hysteresis)]
+        best = min(candidates, key=lambda name: estimates[name][0],
+                   default=None)
+
+        target = None
+        if current != 'text' and \
+                not self._acceptable(estimates[current], 0):
+            target = best or 'text'
+        elif best is not None and (current == 'text' or
+                                   estimates[best][0] <
+                                   estimates[current][0] - self.hysteresis):
+            target = best
+
+        if target is None:
+            self._pending = None
+            return
+
+        if target == self._pending:
+            self._pending_count += 1
+        else:
+            self._pending, self._pending_count = target, 1
+        if self._pending_count < self.patience or self._switching:
+            return
+
+        self._pending = None
+        reason = self._describe(current, target, estimates)
+        self._switching = True
+        asyncio.ensure_future(self._switch(current, target, reason),
+                              loop=self._connection._loop)
+
+    def _describe(self, current, target, estimates):
+        def summary(name):
+            ratio, share = estimates[name]
+            return '{} saves {:.0%} at {:.1%} of the loop'.format(
+                name, 1 - ratio, share)
+
+        if target == 'text':
+            return '{}; the limits are {:.0%} saved at {:.1%}'.format(
+                summary(current), self.min_saving, self.max_cpu_share)
+        return '{}, against {}'.format(summary(target), summary(current))
+
+    async def _switch(self, current, target, reason):
+        scheme = TextEncoding() if target == 'text' else \
+            self.schemes[target]()
+        try:
+            switched = await self._connection.set_compression(scheme)
+        except Exception as e:
+            logger.warning('error switching compression to %s: %s',
+                           target, e)
+            return
+        finally:
+            self._switching = False
+
+        if not switched:
+            logger.info('server refused %s compression', target)
+            self._refused.add(target)
+            return
+
+        switch = (time.time(), current, target, reason)
+        self.switches.append(switch)
+        self._connection.stats['compression_switches'] += 1
+        logger.info('switched compression from %s to %s: %s',
+                    current, target, reason)
+        for handler in self._handlers:
+            handler(switch)
+        self._reset()
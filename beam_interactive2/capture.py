@@ -0,0 +1,58 @@
+import collections
+import time
+
+SEND = 'SEND'
+RECV = 'RCV'
+
+
+class PacketCapture:
+    """
+    PacketCapture keeps the most recent frames sent and received on a
+    Connection in a fixed-size ring buffer, for debugging. Frames are stored
+    as the serialized text which went over the wire, so recording never
+    copies or touches the live packet dicts, and memory use is bounded by
+    ``size`` frames. Example::
+
+        connection.capture = PacketCapture(size=512)
+        ...
+        for timestamp, direction, frame in connection.capture.dump():
+            print(direction, frame)
+
+    If ``dump_on_error`` is true, the capture is printed whenever a reply
+    carries an error.
+    """
+
+    def __init__(self, size=256, dump_on_error=True):
+        self._frames = collections.deque(maxlen=size)
+        self.dump_on_error = dump_on_error
+
+    def __len__(self):
+        return len(self._frames)
+
+    def record(self, direction, frame):
+        """
+        Adds a frame to the capture, evicting the oldest if it's full.
+        :param direction: Either SEND or RECV
+        :type direction: str
+        :param frame: The serialized frame
+        :type frame: str
+        """
+        self._frames.append((time.time(), direction, frame))
+
+    def dump(self):
+        """
+        Returns the captured frames, oldest first, as a list of
+        (timestamp, direction, frame) tuples.
+        :rtype: list
+        """
+        return list(self._frames)
+
+    def format(self):
+        """
+        Returns the captured frames formatted one per line.
+        :rtype: str
+        """
+        return '\n'.join('[{:.3f}] [{}]: {}'.format(*f) for f in self._frames)
+
+    def clear(self):
+        self._frames.clear()
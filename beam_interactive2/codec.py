@@ -0,0 +1,105 @@
+from abc import abstractmethod
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+
+class Codec:
+    """Codec is an abstract class that defines how packets are serialized to
+    and parsed from JSON text. It sits beneath the Encoding: a Codec turns
+    dicts into strings, and the Encoding then compresses those strings.
+    """
+
+    @abstractmethod
+    def name(self):
+        pass
+
+    @abstractmethod
+    def dumps(self, data):
+        """ dumps takes a packet and returns its JSON string form """
+        pass
+
+    @abstractmethod
+    def loads(self, data):
+        """ loads takes a JSON string and returns the parsed packet """
+        pass
+
+
+class JsonCodec(Codec):
+    """JsonCodec uses the standard library's json module. It's always
+    available, and is used if no faster serializer is installed.
+    """
+
+    def __init__(self):
+        # json.dumps builds a new encoder on every call when it's given
+        # separators, so keep one around.
+        self._encoder = json.JSONEncoder(separators=(',', ':'))
+
+    def name(self):
+        return 'json'
+
+    def dumps(self, data):
+        return self._encoder.encode(data)
+
+    def loads(self, data):
+        return json.loads(data)
+
+
+class OrjsonCodec(Codec):
+    """OrjsonCodec uses the orjson package, if it's installed."""
+
+    def name(self):
+        return 'orjson'
+
+    def dumps(self, data):
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS) \
+            .decode('utf-8')
+
+    def loads(self, data):
+        return orjson.loads(data)
+
+
+class UjsonCodec(Codec):
+    """UjsonCodec uses the ujson package, if it's installed."""
+
+    def name(self):
+        return 'ujson'
+
+    def dumps(self, data):
+        return ujson.dumps(data, ensure_ascii=False,
+                           escape_forward_slashes=False)
+
+    def loads(self, data):
+        return ujson.loads(data)
+
+
+def available_codecs():
+    """
+    Returns a list of all codecs which can be used in this environment,
+    fastest first.
+    :rtype: list of Codec
+    """
+    codecs = []
+    if orjson is not None:
+        codecs.append(OrjsonCodec())
+    if ujson is not None:
+        codecs.append(UjsonCodec())
+    codecs.append(JsonCodec())
+    return codecs
+
+
+def default_codec():
+    """
+    Returns the fastest codec available, falling back to the standard
+    library's json module.
+    :rtype: Codec
+    """
+    return available_codecs()[0]
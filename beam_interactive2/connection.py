@@ -6,50 +6,29 @@ import json
 import asyncio
 import websockets
 import collections
+import random
+import copy
+import re
 
 from .log import logger
-from .encoding import Encoding, TextEncoding
-
-
-class Call:
-    def __init__(self, connection, payload):
-        """
-        A Call is an incoming message from the Interactive service.
-        :param connection: the connection
-        :param payload:
-        """
-        self._connection = connection
-        self._payload = payload
-
-    @property
-    def name(self):
-        """
-        :return: The name of the method being called.
-        :rtype: str
-        """
-        return self._payload['method']
-
-    @property
-    def data(self):
-        """
-        :return: The payload of the method being called.
-        :rtype: dict
-        """
-        return self._payload['params']
-
-    async def reply_error(self, result):
-        """
-        Submits a successful reply for the call.
-        :param result: The result to send to tetrisd
-        """
-        await self._connection.reply(self._id, result=result)
-
-    async def reply_error(self, error):
-        """
-        Submits an errorful reply for the call.
-        :param error: The error to send to tetrisd
-        """
-        await self._connection.reply(self._id, error=error)
+from .encoding import Encoding, EncodingException, TextEncoding
+from .codec import default_codec, JsonCodec
+from .templates import PacketTemplates
+from .timeouts import TimeoutWheel
+from .queues import RecvQueue, SendQueue, BLOCK
+from .capture import PacketCapture, SEND, RECV
+from .messages import Call, decode_message, message_types
+from .streaming import ReplyStream, SinkFanOut, chunk_size
+from .transport import websocket_kwargs
+
+collapsible_methods = frozenset(['getScenes', 'getGroups', 'getTime',
+                                 'getAllParticipants'])
+
+# Matches the start of a method packet as the service writes it, to read
+# the method name without parsing the rest.
+method_header = re.compile(r'\{\s*(?:"id"\s*:\s*\d+\s*,\s*)?'
+                           r'"type"\s*:\s*"method"\s*,\s*'
+                           r'"method"\s*:\s*"([^"\\]*)"')
 
 
 class Connection:
@@ -61,12 +40,111 @@ class Connection:
             address=get_interactive_address(),
             authorization="Bearer {}".format(my_oauth_token),
             interactive_version_id=1234)
+
+    Outgoing packets are normally sent one websocket frame at a time. Passing
+    a ``batch_window`` (in seconds) gathers packets sent within that window
+    into a single JSON array frame; a window of ``0`` batches everything
+    sent within the same tick of the event loop. The ``stats`` counter
+    tracks ``frames_sent`` and ``packets_sent`` so you can see how much
+    batching actually happens.
+
+    Passing a ``send_high_watermark`` puts outbound packets on a queue
+    which a background task writes to the socket, so that calls don't wait
+    on a slow network. Replies and methods in ``priority_methods`` (by
+    default, ``capture``) skip ahead of bulk traffic. When the queue reaches
+    the high watermark, calls made with ``discard=True`` are dropped until
+    it drains to ``send_low_watermark``; see SendQueue for the counters.
+    With a ``batch_window`` as well, everything waiting on the queue is
+    written as one frame.
+
+    With ``collapse_calls=True``, concurrent identical calls to read-only
+    methods (getScenes, getGroups, getTime and getAllParticipants) share a
+    single request and reply. Items streamed to sinks are passed to the
+    sinks of every caller. ``stats['calls_collapsed']`` counts the calls
+    which were saved.
+
+    Pass an AdaptiveCompression as ``compression_policy`` to have the
+    connection switch between text and compressed encodings by itself,
+    based on how much compression saves and costs on it.
+
+    Frames of at least ``offload_threshold`` bytes are decompressed and
+    parsed on the ``executor`` (the loop's default executor if None), so
+    a large reply doesn't stall the event loop. The read loop waits for
+    each frame before reading the next, so ordering and the compression
+    stream's state are unaffected. ``stats['frames_offloaded']`` counts
+    these frames.
+
+    ``transport_compression`` configures permessage-deflate at the
+    websocket layer: pass a PerMessageDeflate with the settings to offer,
+    or False to turn it off. By default websockets offers it with its own
+    settings, where the installed version supports it.
+
+    With ``lazy_calls=True``, method calls only have their name read off
+    the frame as they arrive, and are parsed in full when their data is
+    first used. Setting ``method_filter`` to a set of method names (or
+    anything else supporting ``in``) drops calls to other methods before
+    they're queued; ``stats['calls_filtered']`` counts them. Together, the
+    two let calls nobody handles go without ever being parsed.
+
+    With ``typed_messages=True``, calls to the high-volume methods are
+    decoded into the compact classes in ``messages`` (ButtonInput,
+    JoystickInput, ParticipantJoin and so on) instead of keeping their
+    parsed dicts. They still support ``data``.
+
+    Calls made with ``sinks`` have the items of the arrays in their result
+    passed to the sinks one at a time (see ``call``). Replies to them of
+    at least ``stream_threshold`` bytes are decompressed and parsed in
+    chunks as they're passed on, so that the whole reply is never held in
+    memory at once; ``stats['frames_streamed']`` counts these frames.
+    Streamed frames are captured and recorded without the items, and
+    aren't sampled by the ``compression_policy``.
+
+    Packets are serialized with a ``codec``. By default the fastest JSON
+    library installed is used, falling back to the standard library.
+    With the standard library's json and ``packet_templates=True``, capture
+    calls (see ``templates.hot_methods``) are written by splicing their
+    transaction ID into pre-encoded text, which is modestly faster.
+    Templates don't help other packets, or native codecs such as orjson.
+
+    ``max_in_flight`` caps the number of calls awaiting a reply at once.
+    Calls beyond the cap wait for a slot before they're written to the
+    socket; ``in_flight`` reports how much of the window is in use, and
+    ``stats['call_window_waits']`` counts the calls which had to wait.
+
+    Received calls wait in a queue until they're read with ``get_packet``.
+    It's unbounded by default; ``recv_queue_size`` bounds it and
+    ``recv_overflow`` picks what happens when it fills up. See RecvQueue
+    for the available policies. With ``drain_recv=True``, the connection
+    reads every frame already buffered on the socket before waking
+    consumers, so they're signalled once per batch rather than once per
+    packet; ``recv_batch_size`` reports the average batch.
+
+    Assign a PacketCapture to ``capture`` to keep a ring buffer of recent
+    frames for debugging, or a Recorder to ``recorder`` to stream every
+    frame to a file which can be replayed with a ReplaySocket.
+
+    With ``reconnect=True``, a dropped connection is re-established with
+    jittered exponential backoff between ``reconnect_delay`` and
+    ``max_reconnect_delay`` seconds. Once the handshake completes again,
+    compression is renegotiated, calls made with ``replay=True`` are sent
+    again, and reconnect handlers (see ``add_reconnect_handler``) are run.
+    Other calls awaiting a reply fail with a ConnectionLostError as soon as
+    the connection drops.
     """
 
     def __init__(self, address=None, authorization=None,
                  project_version_id=None, project_sharecode=None,
                  extra_headers={}, loop=asyncio.get_event_loop(), socket=None,
-                 protocol_version="2.0"):
+                 protocol_version="2.0", batch_window=None, codec=None,
+                 max_in_flight=None, recv_queue_size=None,
+                 recv_overflow=BLOCK, reconnect=False, reconnect_delay=0.5,
+                 max_reconnect_delay=30, drain_recv=False,
+                 send_high_watermark=None, send_low_watermark=None,
+                 collapse_calls=False, compression_policy=None,
+                 offload_threshold=None, executor=None,
+                 transport_compression=None, lazy_calls=False,
+                 typed_messages=False, stream_threshold=None,
+                 packet_templates=False):
 
         if authorization is not None:
             extra_headers['Authorization'] = authorization
@@ -76,21 +154,84 @@ class Connection:
             extra_headers['X-Interactive-Sharecode'] = project_sharecode
         extra_headers['X-Protocol-Version'] = protocol_version
 
-        self._socket_or_connector = socket or websockets.client.connect(
-            address, loop=loop, extra_headers=extra_headers)
+        self._loop = loop
+        self._address = address
+        self._extra_headers = extra_headers
+        self._transport_compression = transport_compression
+        self._socket_or_connector = socket or self._connector()
         self._socket = None
+        self._reconnect = reconnect
+        self._reconnect_delay = reconnect_delay
+        self._max_reconnect_delay = max_reconnect_delay
+        self._reconnect_handlers = []
+        self._replay_calls = {}
+        self._closing = False
 
-        self._loop = loop
         self._encoding = TextEncoding()
+        self._codec = codec or default_codec()
+        self._dumps = self._codec.dumps
+        if packet_templates and isinstance(self._codec, JsonCodec):
+            self._dumps = PacketTemplates(self._codec).dumps
         self._awaiting_replies = {}
+        self._stream_sinks = {}
+        self._sink_errors = {}
+        self._reply_hooks = {}
+        self._stream_threshold = stream_threshold
+        self._timeouts = TimeoutWheel(loop)
         self._call_counter = 0
-
-        self._recv_queue = collections.deque()
+        self._collapse_calls = collapse_calls
+        self._collapsed_calls = {}
+        self._max_in_flight = max_in_flight
+        self._call_window = None
+        if max_in_flight is not None:
+            self._call_window = asyncio.Semaphore(max_in_flight, loop=loop)
+
+        self._batch_window = batch_window
+        self._send_batch = []
+        self._send_batch_sent = None
+        self.stats = collections.Counter()
+
+        self._send_queue = None
+        if send_high_watermark is not None:
+            self._send_queue = SendQueue(send_high_watermark,
+                                         send_low_watermark, self.stats)
+        self._send_task = None
+        self._send_wake = None
+        self.priority_methods = {'capture'}
+
+        self._recv_queue = RecvQueue(recv_queue_size, recv_overflow,
+                                     self.stats, loop)
         self._recv_await = None
         self._recv_task = None
+        self._drain_recv = drain_recv
+        self._recv_batch = 0
         self.print_packets = [False, False]
-        self.hold_packets = False
-        self.packets = {}
+        self.capture = None
+        self.recorder = None
+        self.compression_policy = compression_policy
+        if compression_policy is not None:
+            compression_policy.attach(self)
+        self._offload_threshold = offload_threshold
+        self._executor = executor
+        self._lazy_calls = lazy_calls
+        self._typed_messages = typed_messages
+        self.method_filter = None
+
+    @property
+    def hold_packets(self):
+        """
+        Whether packets are being recorded into ``capture``. Setting this
+        to True starts a PacketCapture with the default size.
+        :rtype: bool
+        """
+        return self.capture is not None
+
+    @hold_packets.setter
+    def hold_packets(self, value):
+        if not value:
+            self.capture = None
+        elif self.capture is None:
+            self.capture = PacketCapture()
 
     async def connect(self):
         """
@@ -99,10 +240,22 @@ class Connection:
         if something, such as authentication, fails.
         """
 
-        if not hasattr(self._socket_or_connector, '__await__'):
-            self._socket = self._socket_or_connector
+        await self._open(self._socket_or_connector)
+        self._recv_task = asyncio.ensure_future(self._read(), loop=self._loop)
+
+    def _connector(self):
+        return websockets.client.connect(
+            self._address, loop=self._loop, extra_headers=self._extra_headers,
+            **websocket_kwargs(self._transport_compression))
+
+    async def _open(self, socket_or_connector):
+        """
+        Opens the socket and waits for the server's hello.
+        """
+        if not hasattr(socket_or_connector, '__await__'):
+            self._socket = socket_or_connector
         else:
-            self._socket = await self._socket_or_connector
+            self._socket = await socket_or_connector
 
         # await a hello event
         while True:
@@ -111,9 +264,84 @@ class Connection:
                 print("Handshake successful!")
                 break
 
-            self._recv_queue.append(packet)
+            self._recv_queue.append(Call(self, packet))
+
+    def add_reconnect_handler(self, handler):
+        """
+        Registers a coroutine function to be called, with no arguments,
+        each time the connection is re-established. Only used when the
+        connection was created with ``reconnect=True``.
+        """
+        self._reconnect_handlers.append(handler)
+
+    async def _reestablish(self):
+        """
+        Reconnects after the socket dropped, retrying with jittered
+        exponential backoff until it succeeds, then starts a new read loop
+        and resumes the session.
+        """
+        self.stats['reconnects'] += 1
+        for call_id, future in list(self._awaiting_replies.items()):
+            if call_id not in self._replay_calls and not future.done():
+                future.set_exception(ConnectionLostError())
+
+        # The new socket starts out in plain text, and so must anything we
+        # send before compression is negotiated again.
+        encoding = self._encoding
+        self._encoding = TextEncoding()
+
+        dropped = self._socket
+        attempt = 0
+        while True:
+            delay = min(self._max_reconnect_delay,
+                        self._reconnect_delay * 2 ** attempt)
+            attempt += 1
+            try:
+                await asyncio.sleep(random.uniform(delay / 2, delay),
+                                    loop=self._loop)
+                await self._open(self._connector())
+                break
+            except asyncio.CancelledError:
+                self._signal_closed()
+                return
+            except Exception as e:
+                # Anything from a refused handshake to a garbled hello; if
+                # we gave up here, no read loop would ever be started again.
+                logger.warning("error reconnecting to Interactive, "
+                               "retrying: %r", e)
+                if self._socket is not dropped:
+                    await self._abandon(self._socket)
 
         self._recv_task = asyncio.ensure_future(self._read(), loop=self._loop)
+        asyncio.ensure_future(self._resume(encoding), loop=self._loop)
+
+    async def _abandon(self, socket):
+        """
+        Closes a socket which was opened while reconnecting, but didn't get
+        as far as the hello.
+        """
+        try:
+            await socket.close()
+        except Exception as e:
+            logger.debug("error closing abandoned socket: %r", e)
+
+    async def _resume(self, encoding):
+        """
+        Restores the session after reconnecting: renegotiates compression
+        with the settings of the encoding used before, replays calls which
+        asked for it, and runs the reconnect handlers.
+        """
+        if not isinstance(encoding, TextEncoding):
+            await self.set_compression(encoding.fresh())
+
+        for packet in list(self._replay_calls.values()):
+            await self._send(packet)
+
+        for handler in self._reconnect_handlers:
+            try:
+                await handler()
+            except Exception as e:
+                logger.error("error in reconnect handler: %s", e)
 
     def _fallback_to_plain_text(self):
         if isinstance(self._encoding, TextEncoding):
@@ -128,9 +356,21 @@ class Connection:
         Converts the packet data to a string,
         decompressing it if necessary. Always returns a string.
         """
+        if self.compression_policy is not None:
+            start = time.perf_counter()
+            text = data if isinstance(data, str) else \
+                self._decode_compressed(data)
+            if text is not None:
+                self.compression_policy.observe(
+                    RECV, text, data, time.perf_counter() - start)
+            return text
+
         if isinstance(data, str):
             return data
 
+        return self._decode_compressed(data)
+
+    def _decode_compressed(self, data):
         try:
             return self._encoding.decode(data)
         except Exception as e:
@@ -144,7 +384,14 @@ class Connection:
         compressing it if necessary.
         """
         try:
-            return self._encoding.encode(data)
+            if self.compression_policy is None:
+                return self._encoding.encode(data)
+
+            start = time.perf_counter()
+            encoded = self._encoding.encode(data)
+            self.compression_policy.observe(
+                SEND, data, encoded, time.perf_counter() - start)
+            return encoded
         except Exception as e:
             self._fallback_to_plain_text()
             logger.warn("error encoding Interactive message, falling back to"
@@ -156,67 +403,343 @@ class Connection:
         """
         Handles a single received packet from the Interactive service.
         """
-        if self.hold_packets:
-            temp = data
-            temp["transfer"] = "RCV"
-            if data["id"] not in self.packets:
-                self.packets[data["id"]] = []
-            self.packets[data["id"]].append(temp)
         if data['type'] == 'reply':
             if data['id'] in self._awaiting_replies:
                 if "error" in data:
+                    self._stream_sinks.pop(data['id'], None)
+                    self._sink_errors.pop(data['id'], None)
+                    self._reply_hooks.pop(data['id'], None)
 
                     print("There was an error: {}".format(json.dumps(data)))
                     self._awaiting_replies[data['id']]. \
                         set_result("error")
                     del self._awaiting_replies[data['id']]
 
-                    if self.hold_packets:
-                        for d in self.packets[data["id"]]:
-                            t = d.pop("transfer")
-                            print("[{}]: {}".format(t, json.dumps(d)))
+                    if self.capture is not None and \
+                            self.capture.dump_on_error:
+                        print(self.capture.format())
                 else:
-                    self._awaiting_replies[data['id']]. \
-                        set_result(data['result'])
+                    hook = self._reply_hooks.pop(data['id'], None)
+                    if hook is not None:
+                        hook(data['result'])
+                    sinks = self._stream_sinks.get(data['id'])
+                    if sinks is not None:
+                        self._pass_to_sinks(data['result'], sinks)
+                    error = self._sink_errors.pop(data['id'], None)
+                    if error is not None:
+                        self._awaiting_replies[data['id']]. \
+                            set_exception(error)
+                    else:
+                        self._awaiting_replies[data['id']]. \
+                            set_result(data['result'])
                     del self._awaiting_replies[data['id']]
 
             return
 
-        self._recv_queue.append(Call(self, data))
+        if self.method_filter is not None and \
+                data.get('method') not in self.method_filter:
+            self.stats['calls_filtered'] += 1
+            return
+
+        self._queue_call(self._make_call(data))
+
+    def _pass_to_sinks(self, result, sinks):
+        """
+        Passes the items of a reply which wasn't streamed to its sinks.
+        """
+        if not isinstance(result, dict):
+            return
+        for key, sink in sinks.items():
+            items = result.get(key)
+            if isinstance(items, list):
+                result[key] = []
+                for item in items:
+                    sink(item)
+
+    def _guard_sink(self, call_id, sink):
+        """
+        Wraps a call's sink so that an error it raises is kept for the call,
+        which fails with it once its reply has been read, rather than
+        escaping into the read loop. The call's later items are dropped.
+        """
+        def guarded(item):
+            if call_id in self._sink_errors:
+                return
+            try:
+                sink(item)
+            except Exception as e:
+                self._sink_errors[call_id] = e
+
+        return guarded
+
+    def _make_call(self, data):
+        if self._typed_messages:
+            message = decode_message(self, data)
+            if message is not None:
+                return message
+        return Call(self, data)
+
+    def _queue_call(self, call):
+        if not self._recv_queue.append(call):
+            return
+
+        self._recv_batch += 1
+        if not self._drain_recv:
+            self._signal_received()
+
+    def _signal_received(self):
+        """
+        Wakes anyone waiting in has_packet.
+        """
+        self._recv_batch = 0
         if self._recv_await is not None:
             self._recv_await.set_result(True)
             self._recv_await = None
 
+    def _flush_recv_batch(self):
+        """
+        Wakes consumers for the packets drained since they were last woken.
+        """
+        if self._recv_batch == 0:
+            return
+
+        self.stats['recv_batches'] += 1
+        self.stats['recv_batched_packets'] += self._recv_batch
+        self._signal_received()
+
+    def _buffered_frames(self):
+        """
+        Returns how many frames the socket has received which are waiting
+        to be read, if the socket exposes that.
+        """
+        messages = getattr(self._socket, 'messages', None)
+        if isinstance(messages, asyncio.Queue):
+            return messages.qsize()
+        if isinstance(messages, collections.deque):
+            return len(messages)
+        return 0
+
     async def _send(self, payload):
         """
         Encodes and sends a dict payload.
         """
-        if self.hold_packets:
-            temp = payload
-            temp["transfer"] = "SEND"
-            if temp["id"] not in self.packets:
-                self.packets[temp["id"]] = []
-            self.packets[payload["id"]].append(temp)
-        j = json.dumps(payload)
+        j = self._dumps(payload)
         if self.print_packets[1]:
             print("SENT [{}]: {}".format(self._encoding.name(), j))
-        await self._socket.send(j)
+        if self.capture is not None:
+            self.capture.record(SEND, j)
+
+        if self._send_queue is not None:
+            self._enqueue(j, payload)
+            return
+
+        if self._batch_window is None:
+            await self._send_frame(j, 1)
+            return
+
+        self._send_batch.append(j)
+        if self._send_batch_sent is None:
+            self._send_batch_sent = asyncio.Future(loop=self._loop)
+            if self._batch_window > 0:
+                self._loop.call_later(self._batch_window, self._flush_batch)
+            else:
+                self._loop.call_soon(self._flush_batch)
+
+        # Shield the shared future so that one cancelled caller doesn't
+        # cancel the write for everyone else in the batch.
+        await asyncio.shield(self._send_batch_sent, loop=self._loop)
+
+    def _flush_batch(self):
+        """
+        Writes out all packets gathered in the current batch window.
+        """
+        batch, sent = self._send_batch, self._send_batch_sent
+        self._send_batch = []
+        self._send_batch_sent = None
+        if len(batch) == 0:
+            return None
+
+        if len(batch) == 1:
+            frame = batch[0]
+        else:
+            frame = '[' + ','.join(batch) + ']'
+
+        async def write():
+            try:
+                await self._send_frame(frame, len(batch))
+            except Exception as e:
+                sent.set_exception(e)
+            else:
+                sent.set_result(None)
+
+        return asyncio.ensure_future(write(), loop=self._loop)
+
+    def _enqueue(self, j, payload):
+        """
+        Puts a serialized packet on the send queue, and wakes the sender.
+        """
+        priority = payload['type'] == 'reply' or \
+            payload.get('method') in self.priority_methods
+        if not self._send_queue.put(j, priority, payload.get('discard')):
+            return
+
+        if self._send_task is None:
+            self._send_task = asyncio.ensure_future(self._run_sender(),
+                                                    loop=self._loop)
+        self._wake_sender()
+
+    def _wake_sender(self):
+        if self._send_wake is not None and not self._send_wake.done():
+            self._send_wake.set_result(None)
+
+    async def _run_sender(self):
+        """
+        Writes packets from the send queue until the connection is closed
+        and the queue has been drained.
+        """
+        queue = self._send_queue
+        while True:
+            if len(queue) == 0:
+                if self._closing:
+                    return
+                self._send_wake = asyncio.Future(loop=self._loop)
+                await self._send_wake
+                continue
+
+            batch = queue.take(1 if self._batch_window is None else len(queue))
+            frame = batch[0] if len(batch) == 1 \
+                else '[' + ','.join(batch) + ']'
+            try:
+                await self._send_frame(frame, len(batch))
+            except websockets.ConnectionClosed:
+                self.stats['send_failed'] += len(batch)
+            except Exception as e:
+                self.stats['send_failed'] += len(batch)
+                logger.error("error writing to interactive socket: %s", e)
+
+    @property
+    def send_queue_depth(self):
+        """
+        :return: The number of packets waiting on the send queue.
+        :rtype: int
+        """
+        return 0 if self._send_queue is None else len(self._send_queue)
+
+    async def _send_frame(self, frame, packet_count):
+        """
+        Encodes and writes a serialized frame holding one or more packets.
+        """
+        if self.recorder is not None:
+            self.recorder.record(SEND, frame)
+        await self._socket.send(self._encode(frame))
+        self.stats['frames_sent'] += 1
+        self.stats['packets_sent'] += packet_count
 
-    async def _read_single(self):
+    async def _read_single(self, lazy=False):
         """
-        Reads a single event off the websocket.
+        Reads a single event off the websocket. If ``lazy`` is True, method
+        calls are returned as unparsed Calls, or None if the method filter
+        drops them.
         """
         try:
             raw_data = await self._socket.recv()
             if self.print_packets[0]:
                 print("RCV: {}".format(raw_data))
         except (asyncio.CancelledError, websockets.ConnectionClosed) as e:
-            if self._recv_await is None:
-                self._recv_await = asyncio.Future(loop=self._loop)
-            self._recv_await.set_result(False)
+            if not self._will_reconnect(e):
+                self._signal_closed()
             raise e
 
-        return json.loads(self._decode(raw_data))
+        if self._stream_sinks and self._stream_threshold is not None and \
+                len(raw_data) >= self._stream_threshold:
+            return self._read_streamed(raw_data)
+
+        if self._offload_threshold is not None and \
+                len(raw_data) >= self._offload_threshold:
+            return await self._read_offloaded(raw_data)
+
+        data = self._decode(raw_data)
+        self._record_recv(data)
+        if lazy:
+            header = method_header.match(data)
+            if header is not None:
+                return self._lazy_call(data, header.group(1))
+
+        return self._codec.loads(data)
+
+    def _lazy_call(self, data, name):
+        if self.method_filter is not None and name not in self.method_filter:
+            self.stats['calls_filtered'] += 1
+            return None
+
+        if self._typed_messages and name in message_types:
+            return self._make_call(self._codec.loads(data))
+        return Call(self, None, raw=data, name=name)
+
+    def _record_recv(self, data):
+        if self.capture is not None:
+            self.capture.record(RECV, data)
+        if self.recorder is not None:
+            self.recorder.record(RECV, data)
+
+    def _read_streamed(self, raw_data):
+        """
+        Decodes and parses a large frame a chunk at a time, passing the
+        items of any reply to a call with sinks on as they're parsed.
+        """
+        self.stats['frames_streamed'] += 1
+        stream = ReplyStream(self._stream_sinks.get)
+        encoding = TextEncoding() if isinstance(raw_data, str) else \
+            self._encoding
+        try:
+            for text in encoding.decode_chunks(raw_data, chunk_size):
+                stream.feed(text)
+        except EncodingException as e:
+            self._fallback_to_plain_text()
+            logger.info("error decoding Interactive message, falling back to"
+                        "plain text", extra=e)
+            raise
+
+        data = stream.close()
+        self._record_recv(data)
+        return self._codec.loads(data)
+
+    async def _read_offloaded(self, raw_data):
+        """
+        Decodes and parses a large frame on the executor. Only the work
+        on the frame itself happens off the loop; falling back, sampling
+        for the compression policy and recording stay on it.
+        """
+        self.stats['frames_offloaded'] += 1
+        data, seconds, packet = await self._loop.run_in_executor(
+            self._executor, self._decode_and_parse, self._encoding,
+            raw_data)
+
+        if isinstance(packet, Exception):
+            self._fallback_to_plain_text()
+            logger.info("error decoding Interactive message, falling back to"
+                        "plain text", extra=packet)
+            raise packet
+
+        if self.compression_policy is not None:
+            self.compression_policy.observe(RECV, data, raw_data, seconds)
+        self._record_recv(data)
+        return packet
+
+    def _decode_and_parse(self, encoding, raw_data):
+        """
+        Runs on the executor. Returns the frame's text, the time spent
+        decoding it and the parsed packet, or the decoding error in place
+        of the packet.
+        """
+        start = time.perf_counter()
+        try:
+            data = raw_data if isinstance(raw_data, str) else \
+                encoding.decode(raw_data)
+        except Exception as e:
+            return None, 0, e
+
+        return data, time.perf_counter() - start, self._codec.loads(data)
 
     async def _read(self):
         """
@@ -224,19 +747,46 @@ class Connection:
         """
         while True:
             try:
-                data = await self._read_single()
-            except (asyncio.CancelledError, websockets.ConnectionClosed):
+                if self._recv_queue.full():
+                    self._flush_recv_batch()  # don't block with a batch held
+                await self._recv_queue.wait_for_space()
+                data = await self._read_single(self._lazy_calls)
+            except websockets.ConnectionClosed as e:
+                if self._will_reconnect(e):
+                    await self._reestablish()
+                break  # will already be handled
+            except asyncio.CancelledError:
                 break  # will already be handled
             except Exception as e:
                 logger.error("error in interactive read loop", extra=e)
                 break
 
-            if isinstance(data, list):
+            if isinstance(data, Call):
+                self._queue_call(data)
+            elif isinstance(data, list):
                 for item in data:
                     self._handle_recv(item)
-            else:
+            elif data is not None:
                 self._handle_recv(data)
 
+            if self._drain_recv and self._buffered_frames() == 0:
+                self._flush_recv_batch()
+
+    def _signal_closed(self):
+        """
+        Tells anyone waiting in has_packet that no more packets are coming.
+        """
+        if self._recv_await is None:
+            self._recv_await = asyncio.Future(loop=self._loop)
+        self._recv_await.set_result(False)
+
+    def _will_reconnect(self, error):
+        """
+        Returns whether the error will be handled by reconnecting.
+        """
+        return self._reconnect and not self._closing and \
+            isinstance(error, websockets.ConnectionClosed)
+
     async def set_compression(self, scheme):
         """Updates the compression used on the websocket this should be
         called with an instance of the Encoding class, for example::
@@ -250,12 +800,16 @@ class Connection:
         :return: Whether the upgrade was successful
         :rtype: bool
         """
-        result = await self.call("setCompression", {'scheme': [scheme.name()]})
-        if result['scheme'] == scheme.name():
-            self._encoding = scheme
-            return True
+        def switch(result):
+            # Switch as soon as the reply is read, since the server's next
+            # frame may already be using the new scheme.
+            if result['scheme'] == scheme.name():
+                self._encoding = scheme
 
-        return False
+        result = await self._call("setCompression",
+                                  {'scheme': [scheme.name()]}, False, 10,
+                                  False, hook=switch)
+        return result['scheme'] == scheme.name()
 
     async def reply(self, call_id, result=None, error=None):
         """
@@ -271,11 +825,12 @@ class Connection:
         if result is not None:
             packet['result'] = result
         if error is not None:
-            packet['error'] = result
+            packet['error'] = error
 
         await self._send(packet)
 
-    async def call(self, method, params={}, discard=False, timeout=10):
+    async def call(self, method, params={}, discard=False, timeout=10,
+                   replay=False, sinks=None):
         """
         Sends a method call to the interactive socket. If discard
         is false, we'll wait for a response before returning, up to the
@@ -287,12 +842,63 @@ class Connection:
         :param params: Parameters to insert into the method, generally a dict.
         :param discard: ``True`` to not request any reply to the method.
         :type discard: bool
-        :param timeout: Call timeout duration, in seconds.
+        :param timeout: Call timeout duration, in seconds. Time spent
+                        waiting for a slot in the in-flight window is not
+                        counted.
         :type timeout: int
+        :param replay: ``True`` to send the call again if the connection
+                       reconnects before it's answered. Otherwise it fails
+                       with a ConnectionLostError.
+        :type replay: bool
+        :param sinks: Functions keyed by the names of arrays in the result.
+                      Each item of ``result[name]`` is passed to
+                      ``sinks[name]`` as it's read, and the array is left
+                      empty in the result. If a sink raises, the call
+                      fails with its error once the reply has been read.
+        :type sinks: dict
         :return: The call response, or None if it was discarded.
-        :raises: asyncio.TimeoutError
+        :raises: asyncio.TimeoutError, ConnectionLostError
         """
+        if not self._collapse_calls or discard or \
+                method not in collapsible_methods:
+            return await self._call(method, params, discard, timeout, replay,
+                                    sinks)
+
+        key = (method, self._codec.dumps(params),
+               None if sinks is None else tuple(sorted(sinks)))
+        entry = self._collapsed_calls.get(key)
+        if entry is None:
+            fan_out = None if sinks is None else SinkFanOut(sinks)
+
+            # Stop sharing once the reply is read, as a caller who joins
+            # later would miss the items already passed to the sinks.
+            def release(*_):
+                if self._collapsed_calls.get(key) is entry:
+                    del self._collapsed_calls[key]
+
+            shared = asyncio.ensure_future(
+                self._call(method, params, discard, timeout, replay,
+                           None if fan_out is None else fan_out.sinks,
+                           hook=release),
+                loop=self._loop)
+            entry = self._collapsed_calls[key] = (shared, fan_out)
+            shared.add_done_callback(release)
+        else:
+            shared, fan_out = entry
+            self.stats['calls_collapsed'] += 1
 
+        caller = None if fan_out is None else fan_out.add(sinks)
+
+        # Everyone gets their own copy of the result, since callers such as
+        # State.get_scenes modify what they get back.
+        result = copy.deepcopy(
+            await asyncio.shield(shared, loop=self._loop))
+        if fan_out is not None and caller in fan_out.errors:
+            raise fan_out.errors[caller]
+        return result
+
+    async def _call(self, method, params, discard, timeout, replay,
+                    sinks=None, hook=None):
         packet = {
             'type': 'method',
             'id': self._call_counter,
@@ -302,20 +908,64 @@ class Connection:
         }
 
         self._call_counter += 1
-        await self._send(packet)
 
         if discard:
+            await self._send(packet)
             return None
 
-        future = asyncio.Future(loop=self._loop)
+        if self._call_window is not None:
+            if self._call_window.locked():
+                self.stats['call_window_waits'] += 1
+            await self._call_window.acquire()
 
+        # Register for the reply before sending, so that we can't miss
+        # a reply which comes back while we're still writing.
+        future = asyncio.Future(loop=self._loop)
         self._awaiting_replies[packet['id']] = future
+        if sinks is not None:
+            self._stream_sinks[packet['id']] = {
+                name: self._guard_sink(packet['id'], sink)
+                for name, sink in sinks.items()}
+        if hook is not None:
+            self._reply_hooks[packet['id']] = hook
+        if replay and self._reconnect:
+            self._replay_calls[packet['id']] = packet
 
         try:
-            return await asyncio.wait_for(self._awaiting_replies[packet['id']], timeout, loop=self._loop)
-        except Exception as e:
-            del self._awaiting_replies[packet['id']]
-            raise e
+            try:
+                await self._send(packet)
+            except websockets.ConnectionClosed:
+                # Replayable calls are sent again once we've reconnected.
+                if packet['id'] not in self._replay_calls:
+                    raise
+            if timeout is not None:
+                self._timeouts.add(future, timeout)
+            return await future
+        finally:
+            self._awaiting_replies.pop(packet['id'], None)
+            self._stream_sinks.pop(packet['id'], None)
+            self._sink_errors.pop(packet['id'], None)
+            self._reply_hooks.pop(packet['id'], None)
+            self._replay_calls.pop(packet['id'], None)
+            if self._call_window is not None:
+                self._call_window.release()
+
+    @property
+    def in_flight(self):
+        """
+        :return: The number of calls currently awaiting a reply.
+        :rtype: int
+        """
+        return len(self._awaiting_replies)
+
+    @property
+    def max_in_flight(self):
+        """
+        :return: The maximum number of calls which may await a reply at
+                 once, or None if unbounded.
+        :rtype: int
+        """
+        return self._max_in_flight
 
     def get_packet(self):
         """
@@ -331,6 +981,29 @@ class Connection:
 
         return None
 
+    def get_packets(self, max_n=None):
+        """
+        Synchronously reads up to max_n packets from the connection, or all
+        queued packets if max_n is None. Returns an empty list if there are
+        no packets in the queue.
+
+        :rtype: list of Call
+        """
+        queue = self._recv_queue
+        count = len(queue) if max_n is None else min(max_n, len(queue))
+        return [queue.popleft() for _ in range(count)]
+
+    @property
+    def recv_batch_size(self):
+        """
+        :return: The average number of packets consumers were woken for at
+                 once, when draining received frames in batches.
+        :rtype: float
+        """
+        if self.stats['recv_batches'] == 0:
+            return 0
+        return self.stats['recv_batched_packets'] / self.stats['recv_batches']
+
     async def has_packet(self):
         """
         Blocks until a packet is read. Returns true if a packet is then
@@ -341,7 +1014,7 @@ class Connection:
         :rtype: bool
         """
         if len(self._recv_queue) > 0:
-            return
+            return True
 
         if self._recv_await is None:
             self._recv_await = asyncio.Future(loop=self._loop)
@@ -349,9 +1022,20 @@ class Connection:
         return await self._recv_await
 
     async def close(self):
-        """Closes the socket connection gracefully"""
+        """Closes the socket connection gracefully, and the recorder if any"""
+        self._closing = True
+        pending = self._flush_batch()
+        if pending is not None:
+            await pending
+        if self._send_task is not None:
+            self._wake_sender()
+            await self._send_task
         self._recv_task.cancel()
-        await self._socket.close()
+        try:
+            await self._socket.close()
+        finally:
+            if self.recorder is not None:
+                self.recorder.close()
 
 
 class Auth:
@@ -0,0 +1,121 @@
+"""
+Builds preset dictionaries for the DictionaryEncoding out of representative
+traffic. To build one from session recordings or JSON text files, run::
+
+    python -m beam_interactive2.dictionary -o traffic.zdict session.rec ...
+
+Both sides of a connection must use the same dictionary, so a dictionary
+built this way has to be given to the server as well.
+"""
+import argparse
+import collections
+import re
+import sys
+
+from .recording import magic, read_recording
+
+# JSON tokens: strings (with the colon following a key), numbers, literals
+# and structural characters.
+token_pattern = re.compile(
+    r'"(?:[^"\\]|\\.)*":?|-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?'
+    r'|true|false|null|[{}\[\],:]')
+
+
+def _fragments(message, max_tokens):
+    tokens = token_pattern.findall(message)
+    seen = set()
+    for start in range(len(tokens)):
+        fragment = ''
+        for token in tokens[start:start + max_tokens]:
+            fragment += token
+            if fragment not in seen:
+                seen.add(fragment)
+                yield fragment
+
+
+def build_dictionary(messages, size=4096, max_tokens=6, min_count=2):
+    """
+    Builds a preset dictionary from an iterable of JSON messages. Runs of
+    up to ``max_tokens`` JSON tokens are scored by how many bytes they'd
+    cover across all the messages, and the best are packed into the
+    dictionary, with the most valuable last since deflate finds nearer
+    matches more cheaply.
+
+    :param messages: JSON text of representative messages
+    :type messages: Iterable of str
+    :param size: The largest dictionary to build, in bytes
+    :type size: int
+    :param max_tokens: The longest run of tokens to consider
+    :type max_tokens: int
+    :param min_count: Fragments seen in fewer messages than this are left
+                      out, which keeps out IDs and other one-off values
+    :type min_count: int
+    :rtype: bytes
+    """
+    counts = collections.Counter()
+    for message in messages:
+        counts.update(_fragments(message, max_tokens))
+
+    candidates = sorted(
+        ((count * len(fragment), fragment)
+         for fragment, count in counts.items()
+         if count >= min_count and len(fragment) > 2),
+        reverse=True)
+
+    chosen, used = [], 0
+    for _, fragment in candidates:
+        data = fragment.encode('utf-8')
+        if used + len(data) > size:
+            continue
+        # Anything covered by a fragment we already have adds nothing.
+        if any(fragment in other for other in chosen):
+            continue
+        chosen.append(fragment)
+        used += len(data)
+
+    return ''.join(reversed(chosen)).encode('utf-8')
+
+
+def read_messages(path):
+    """
+    Reads messages from a session recording, or a text file with one JSON
+    message per line.
+    :rtype: Iterator of str
+    """
+    with open(path, 'rb') as f:
+        is_recording = f.read(len(magic)) == magic
+
+    if is_recording:
+        for _, _, frame in read_recording(path):
+            yield frame
+        return
+
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield line
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Builds a deflate preset dictionary from recorded '
+                    'Interactive traffic.')
+    parser.add_argument('paths', nargs='+',
+                        help='session recordings or JSON text files')
+    parser.add_argument('-o', '--output', required=True,
+                        help='file to write the dictionary to')
+    parser.add_argument('-s', '--size', type=int, default=4096,
+                        help='largest dictionary size in bytes')
+    args = parser.parse_args(argv)
+
+    messages = (m for path in args.paths for m in read_messages(path))
+    dictionary = build_dictionary(messages, size=args.size)
+    with open(args.output, 'wb') as f:
+        f.write(dictionary)
+    print('wrote {} byte dictionary to {}'.format(len(dictionary),
+                                                  args.output))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,82 @@
+from asyncio import ensure_future, iscoroutine
+
+from pyee import EventEmitter, PyeeException
+
+
+class DispatchEmitter(EventEmitter):
+    """
+    DispatchEmitter is a pyee EventEmitter which dispatches through a table
+    of each event's listeners, compiled into a tuple the first time the
+    event is emitted and rebuilt only after its listeners change. pyee
+    instead copies the listeners into a new list and checks every result
+    for a coroutine on each emit.
+
+    ``on``, ``once``, ``remove_listener`` and ``emit`` behave as they do in
+    pyee: listeners run in the order they were added, a listener added or
+    removed while an event is being emitted only takes effect from the next
+    emit, and coroutines returned by listeners are scheduled, with their
+    errors emitted as ``error``. Synchronous listeners which return None
+    skip the coroutine check altogether.
+
+    Coroutines are scheduled with asyncio itself rather than through pyee,
+    whose scheduling internals and constructor differ between versions.
+
+    :param loop: The event loop to schedule coroutines on, or None for
+                 asyncio's default
+    """
+
+    def __init__(self, loop=None):
+        super().__init__()
+        self._dispatch = {}
+        self._dispatch_loop = loop
+
+    def _add_event_handler(self, event, k, v):
+        super()._add_event_handler(event, k, v)
+        self._dispatch.pop(event, None)
+
+    def remove_listener(self, event, f):
+        super().remove_listener(event, f)
+        self._dispatch.pop(event, None)
+
+    def _remove_listener(self, event, f):
+        # Newer pyees remove once listeners through this alone.
+        super()._remove_listener(event, f)
+        self._dispatch.pop(event, None)
+
+    def remove_all_listeners(self, event=None):
+        super().remove_all_listeners(event)
+        if event is None:
+            self._dispatch.clear()
+        else:
+            self._dispatch.pop(event, None)
+
+    def _compile(self, event):
+        listeners = self._events.get(event)
+        handlers = tuple(listeners.values()) if listeners else ()
+        self._dispatch[event] = handlers
+        return handlers
+
+    def emit(self, event, *args, **kwargs):
+        handlers = self._dispatch.get(event)
+        if handlers is None:
+            handlers = self._compile(event)
+
+        for f in handlers:
+            result = f(*args, **kwargs)
+            if result is not None and iscoroutine(result):
+                self._schedule_coroutine(result)
+
+        if not handlers and event == 'error':
+            if args:
+                raise args[0]
+            raise PyeeException("Uncaught, unspecified 'error' event.")
+
+        return len(handlers) > 0
+
+    def _schedule_coroutine(self, coroutine):
+        def report(future):
+            if not future.cancelled() and future.exception() is not None:
+                self.emit('error', future.exception())
+
+        ensure_future(coroutine, loop=self._dispatch_loop) \
+            .add_done_callback(report)
@@ -1,9 +1,30 @@
 from abc import abstractmethod
-from gzip import GzipFile
-import varint
-import io
+import codecs
 import zlib
 
+# The dictionary used when none is given. It's made of the fragments which
+# make up most Interactive traffic, the most common last.
+default_dictionary = ''.join([
+    '{"type":"reply","id":', ',"result":{"scenes":[{"sceneID":"default",',
+    '"controls":[', '"kind":"joystick","sampleRate":', '"kind":"button",',
+    '"text":"', '"cost":0,', '"progress":', '"keyCode":', '"position":[',
+    '"size":"large","width":', '"height":', '"x":', '"y":',
+    '"meta":{},', '"error":{"code":', '"message":"',
+    '"method":"onControlUpdate","params":{"sceneID":"default","controls":',
+    '"method":"onGroupUpdate","params":{"groups":[{"groupID":"default",',
+    '"method":"onParticipantLeave","params":{"participants":[',
+    '"method":"onParticipantUpdate","params":{"participants":[',
+    '"method":"onParticipantJoin","params":{"participants":[',
+    '{"sessionID":"', '","userID":', ',"username":"', '","level":',
+    ',"lastInputAt":', ',"connectedAt":', ',"disabled":false,',
+    '"groupID":"default","etag":"', '"}]},"id":0,"discard":true}',
+    '"event":"move","x":', ',"y":', '"event":"mouseup","button":0}',
+    '"event":"mousedown","button":0},"transactionID":"',
+    '{"type":"method","method":"giveInput",',
+    '"params":{"participantID":"', '","input":{"controlID":"',
+    '},"id":0,"discard":true}',
+]).encode('utf-8')
+
 
 class EncodingException(Exception):
     """An EncodingException is raised if an error occurs in an encoding or
@@ -35,21 +56,48 @@ class Encoding:
         returns it decoded, string form """
         pass
 
+    def fresh(self):
+        """ fresh returns a new instance of the encoding with the same
+        settings, for a new stream such as after reconnecting """
+        return type(self)()
+
+    def decode_chunks(self, data, chunk_size):
+        """ decode_chunks decodes like decode(), but yields the string in
+        pieces of around chunk_size characters, so that the whole of it
+        needn't be held at once. The generator must be run to the end. """
+        yield self.decode(data)
+
 
-def reset_buffer(buffer, value=None):
-    buffer.truncate(0)
-    buffer.seek(0)
+def write_varint(value):
+    """
+    Returns the unsigned LEB128 varint encoding of a length prefix.
+    :rtype: bytes
+    """
+    if value < 0x80:
+        return bytes((value,))
 
-    if value is not None:
-        buffer.write(value)
+    out = bytearray()
+    while value >= 0x80:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
 
 
-def reset_buffer(buffer, value=None):
-    buffer.truncate(0)
-    buffer.seek(0)
+def read_varint(view):
+    """
+    Reads a varint length prefix off the start of a bytes-like object,
+    without copying it. Returns the value and the number of bytes it took.
+    :rtype: (int, int)
+    """
+    value = shift = 0
+    for i, byte in enumerate(view):
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, i + 1
+        shift += 7
 
-    if value is not None:
-        buffer.write(value)
+    raise EncodingException('truncated varint length prefix')
 
 
 class TextEncoding(Encoding):
@@ -63,48 +111,113 @@ class TextEncoding(Encoding):
     def decode(self, data):
         return data
 
+    def decode_chunks(self, data, chunk_size):
+        for start in range(0, len(data), chunk_size):
+            yield data[start:start + chunk_size]
+
 
 class GzipEncoding(Encoding):
+    """GzipEncoding compresses each message into one long gzip stream which
+    lives for the whole connection. Each message is prefixed with a varint
+    of its decompressed length, and is sync flushed so that the other side
+    can decode it as soon as it arrives.
+    """
+
     def __init__(self, compression_level=6):
-        super()
-        self._encoder_buffer = io.BytesIO()
-        self._encoder = None
-        self._decoder_buffer = io.BytesIO()
+        super().__init__()
+        self.compression_level = compression_level
+        self._encoder = zlib.compressobj(compression_level, zlib.DEFLATED,
+                                         16 + zlib.MAX_WBITS)
         self._decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
-        self._compression_level = compression_level
+        self._decoder_tail = b''
 
     def name(self):
         return 'gzip'
 
+    def fresh(self):
+        return GzipEncoding(self.compression_level)
+
     def encode(self, data):
         data = data.encode('utf-8')
-        self._encoder_buffer.write(varint.encode(len(data)))
-
-        # Don't initialize the encoder before the first call to encode(), since
-        # it writes the gzip header immediately and we need to insert the
-        # message length prior to that happening.
-        if self._encoder is None:
-            self._encoder = GzipFile(fileobj=self._encoder_buffer, mode='wb',
-                                     compresslevel=self._compression_level)
-
-        self._encoder.write(data)
-        self._encoder.flush()
+        # The first compress() call writes the gzip header, which comes
+        # after the length prefix of the first message.
+        return b''.join((write_varint(len(data)),
+                         self._encoder.compress(data),
+                         self._encoder.flush(zlib.Z_SYNC_FLUSH)))
 
-        output = self._encoder_buffer.getvalue()
-        reset_buffer(self._encoder_buffer)
+    def decode(self, data):
+        view = memoryview(data)
+        decoded_bytes, offset = read_varint(view)
+        if self._decoder_tail:
+            # Input left over from the last message, because it ended
+            # with the empty sync flush block after decoded_bytes of output.
+            view = self._decoder_tail + view[offset:]
+            offset = 0
+
+        try:
+            decoded_data = self._decoder.decompress(view[offset:],
+                                                    decoded_bytes)
+        except zlib.error as e:
+            raise EncodingException(str(e))
+
+        self._decoder_tail = self._decoder.unconsumed_tail
+        return decoded_data.decode('utf-8')
 
-        return output
+    def decode_chunks(self, data, chunk_size):
+        view = memoryview(data)
+        remaining, offset = read_varint(view)
+        view = view[offset:]
+        if self._decoder_tail:
+            view = memoryview(self._decoder_tail + view)
+
+        # Input is fed in slices, since the decompressor copies whatever
+        # it leaves unconsumed on every call.
+        text = codecs.getincrementaldecoder('utf-8')()
+        pos, tail = 0, b''
+        while remaining > 0:
+            if not tail:
+                tail = view[pos:pos + chunk_size]
+                pos += len(tail)
+                if not tail:
+                    raise EncodingException('message ended early')
+            try:
+                out = self._decoder.decompress(tail, min(chunk_size,
+                                                         remaining))
+            except zlib.error as e:
+                raise EncodingException(str(e))
+            tail = self._decoder.unconsumed_tail
+            remaining -= len(out)
+            if out:
+                yield text.decode(out)
+
+        self._decoder_tail = tail + view[pos:]
+        rest = text.decode(b'', True)
+        if rest:
+            yield rest
+
+
+class DictionaryEncoding(GzipEncoding):
+    """DictionaryEncoding frames messages like GzipEncoding, but compresses
+    them as a raw deflate stream primed with a preset dictionary of common
+    Interactive traffic. Short messages, and those early in a connection,
+    compress much better than they would with a cold window.
+
+    Both sides must use the same dictionary. The default one is
+    ``default_dictionary`` in this module; see ``dictionary.build_dictionary``
+    to make one from your own traffic.
+    """
 
-    def decode(self, data):
-        # Decode the varuint prefix off the data first, then smash the remaining
-        # data into the decode buffer and reset it to read any previous tail.
-        prefix_stream = io.BytesIO(data)
-        decoded_bytes = varint.decode_stream(prefix_stream)
-        self._decoder_buffer.write(data[prefix_stream.tell():])
-        self._decoder_buffer.seek(0)
+    def __init__(self, dictionary=None, compression_level=6):
+        super().__init__(compression_level)
+        if dictionary is None:
+            dictionary = default_dictionary
+        self.dictionary = dictionary
+        self._encoder = zlib.compressobj(compression_level, zlib.DEFLATED,
+                                         -zlib.MAX_WBITS, zdict=dictionary)
+        self._decoder = zlib.decompressobj(-zlib.MAX_WBITS, zdict=dictionary)
 
-        decoded_data = self._decoder.decompress(
-            self._decoder_buffer.getbuffer(), decoded_bytes)
-        reset_buffer(self._decoder_buffer, self._decoder.unconsumed_tail)
+    def name(self):
+        return 'zdict'
 
-        return decoded_data.decode('utf-8')
+    def fresh(self):
+        return DictionaryEncoding(self.dictionary, self.compression_level)
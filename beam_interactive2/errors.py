@@ -20,4 +20,11 @@ class DiscoveryError(Exception):
 
 class NoServersAvailableError(Exception):
     """Raised if Beam reports that no servers are available."""
-    pass
\ No newline at end of file
+    pass
+
+
+class ConnectionLostError(Exception):
+    """Raised for calls which were awaiting a reply when the connection
+    to Interactive dropped.
+    """
+    pass
@@ -0,0 +1,390 @@
+"""
+Calls received from the Interactive service. Every call is a Call, which
+exposes its params as ``data``. With ``Connection(typed_messages=True)``,
+the high-volume methods are instead decoded into the compact Call
+subclasses below, which keep their fields in slots rather than a tree of
+dicts::
+
+    def on_input(call):
+        if isinstance(call, JoystickInput):
+            move(call.participant_id, call.x, call.y)
+
+They still have ``data``, rebuilt from their fields the first time it's
+accessed and kept from then on, so existing handlers keep working,
+including those which modify it. Changes made to ``data`` aren't written
+back to the fields, nor are changes to the fields made after it was built.
+"""
+
+
+class Call:
+    __slots__ = ('_connection', '_payload', '_raw', '_name')
+
+    def __init__(self, connection, payload, raw=None, name=None):
+        """
+        A Call is an incoming message from the Interactive service.
+        :param connection: the connection
+        :param payload: The parsed packet, or None to parse it from ``raw``
+                        when it's first needed.
+        :param raw: The packet's JSON text, if it's parsed lazily.
+        :param name: The method name, if it's already been read off ``raw``.
+        """
+        self._connection = connection
+        self._payload = payload
+        self._raw = raw
+        self._name = name
+
+    @property
+    def payload(self):
+        """
+        :return: The whole packet, parsed on first access.
+        :rtype: dict
+        """
+        if self._payload is None:
+            self._payload = self._connection._codec.loads(self._raw)
+            self._raw = None
+        return self._payload
+
+    @property
+    def name(self):
+        """
+        :return: The name of the method being called.
+        :rtype: str
+        """
+        if self._name is not None:
+            return self._name
+        return self.payload['method']
+
+    @property
+    def data(self):
+        """
+        :return: The payload of the method being called.
+        :rtype: dict
+        """
+        return self.payload['params']
+
+    @property
+    def _id(self):
+        return self.payload['id']
+
+    def _assume(self, other):
+        """
+        Takes on the contents of another call of the same type, so that a
+        queued call can be coalesced with a newer one.
+        """
+        for cls in type(self).__mro__:
+            for slot in getattr(cls, '__slots__', ()):
+                setattr(self, slot, getattr(other, slot))
+
+    async def reply(self, result):
+        """
+        Submits a successful reply for the call.
+        :param result: The result to send to tetrisd
+        """
+        await self._connection.reply(self._id, result=result)
+
+    async def reply_error(self, error):
+        """
+        Submits an errorful reply for the call.
+        :param error: The error to send to tetrisd
+        """
+        await self._connection.reply(self._id, error=error)
+
+
+class Message(Call):
+    """
+    Message is the base for calls decoded into typed fields. Subclasses
+    set ``method`` and implement ``from_params`` and ``to_params``.
+    """
+    __slots__ = ('_call_id', '_discard')
+    method = None
+
+    def __init__(self, connection, call_id=0, discard=True):
+        # Set directly rather than through Call.__init__, since messages
+        # are made at the rate calls come in.
+        self._connection = connection
+        self._payload = None
+        self._raw = None
+        self._name = None
+        self._call_id = call_id
+        self._discard = discard
+
+    @property
+    def name(self):
+        return self.method
+
+    @property
+    def payload(self):
+        if self._payload is None:
+            self._payload = {'type': 'method', 'method': self.method,
+                             'params': self.to_params(), 'id': self._call_id,
+                             'discard': self._discard}
+        return self._payload
+
+    @property
+    def data(self):
+        return self.payload['params']
+
+    @property
+    def _id(self):
+        return self._call_id
+
+    def to_params(self):
+        """
+        Rebuilds the call's params.
+        :rtype: dict
+        """
+        raise NotImplementedError()
+
+
+def _extra(data, known):
+    """
+    Returns the entries of data with keys we don't have fields for, or
+    None if there are none, so that nothing is lost when we rebuild it.
+    """
+    for key in data:
+        if key not in known:
+            return {k: v for k, v in data.items() if k not in known}
+    return None
+
+
+def _with_extra(data, extra):
+    if extra is not None:
+        data.update(extra)
+    return data
+
+
+class Input(Message):
+    """Input is a participant's giveInput on a control."""
+    __slots__ = ('participant_id', 'control_id', 'event', 'transaction_id',
+                 '_extra', '_input_extra')
+    method = 'giveInput'
+    params_fields = frozenset(('participantID', 'input', 'transactionID'))
+    input_fields = frozenset(('controlID', 'event'))
+
+    def __init__(self, connection, participant_id, control_id, event,
+                 transaction_id=None, call_id=0, discard=True):
+        super().__init__(connection, call_id, discard)
+        self.participant_id = participant_id
+        self.control_id = control_id
+        self.event = event
+        self.transaction_id = transaction_id
+        self._extra = None
+        self._input_extra = None
+
+    @classmethod
+    def from_params(cls, connection, params, call_id=0, discard=True):
+        given = params['input']
+        message = cls.__new__(cls)
+        Message.__init__(message, connection, call_id, discard)
+        message.participant_id = params['participantID']
+        message.control_id = given['controlID']
+        message.event = given['event']
+        message.transaction_id = params.get('transactionID')
+        message._read_input(given)
+        message._extra = _extra(params, cls.params_fields)
+        message._input_extra = _extra(given, cls.input_fields)
+        return message
+
+    def _read_input(self, given):
+        pass
+
+    def _write_input(self, given):
+        pass
+
+    def to_params(self):
+        given = {'controlID': self.control_id, 'event': self.event}
+        self._write_input(given)
+        params = {'participantID': self.participant_id,
+                  'input': _with_extra(given, self._input_extra)}
+        if self.transaction_id is not None:
+            params['transactionID'] = self.transaction_id
+        return _with_extra(params, self._extra)
+
+
+class ButtonInput(Input):
+    """ButtonInput is a mousedown or mouseup on a button."""
+    __slots__ = ('button',)
+    input_fields = frozenset(('controlID', 'event', 'button'))
+
+    def __init__(self, connection, participant_id, control_id, event,
+                 button=None, transaction_id=None, call_id=0, discard=True):
+        super().__init__(connection, participant_id, control_id, event,
+                         transaction_id, call_id, discard)
+        self.button = button
+
+    def _read_input(self, given):
+        self.button = given.get('button')
+
+    def _write_input(self, given):
+        if self.button is not None:
+            given['button'] = self.button
+
+
+class JoystickInput(Input):
+    """JoystickInput is a move of a joystick, to coordinates in [-1, 1]."""
+    __slots__ = ('x', 'y')
+    input_fields = frozenset(('controlID', 'event', 'x', 'y'))
+
+    def __init__(self, connection, participant_id, control_id, x, y,
+                 transaction_id=None, call_id=0, discard=True):
+        super().__init__(connection, participant_id, control_id, 'move',
+                         transaction_id, call_id, discard)
+        self.x = x
+        self.y = y
+
+    def _read_input(self, given):
+        self.x = given['x']
+        self.y = given['y']
+
+    def _write_input(self, given):
+        given['x'] = self.x
+        given['y'] = self.y
+
+
+class Participant:
+    """Participant is a participant resource, as sent in participant
+    events."""
+    __slots__ = ('session_id', 'user_id', 'username', 'level',
+                 'last_input_at', 'connected_at', 'disabled', 'group_id',
+                 'etag', '_extra')
+    fields = ('sessionID', 'userID', 'username', 'level', 'lastInputAt',
+              'connectedAt', 'disabled', 'groupID', 'etag')
+    known = frozenset(fields)
+
+    def __init__(self, session_id, user_id=None, username=None, level=None,
+                 last_input_at=None, connected_at=None, disabled=None,
+                 group_id=None, etag=None):
+        self.session_id = session_id
+        self.user_id = user_id
+        self.username = username
+        self.level = level
+        self.last_input_at = last_input_at
+        self.connected_at = connected_at
+        self.disabled = disabled
+        self.group_id = group_id
+        self.etag = etag
+        self._extra = None
+
+    @classmethod
+    def from_dict(cls, data):
+        get = data.get
+        participant = cls(data['sessionID'], get('userID'), get('username'),
+                          get('level'), get('lastInputAt'),
+                          get('connectedAt'), get('disabled'),
+                          get('groupID'), get('etag'))
+        participant._extra = _extra(data, cls.known)
+        return participant
+
+    def to_dict(self):
+        """
+        Rebuilds the participant resource.
+        :rtype: dict
+        """
+        data = {}
+        for field, value in zip(self.fields, (
+                self.session_id, self.user_id, self.username, self.level,
+                self.last_input_at, self.connected_at, self.disabled,
+                self.group_id, self.etag)):
+            if value is not None:
+                data[field] = value
+        return _with_extra(data, self._extra)
+
+
+participants_fields = frozenset(('participants',))
+control_update_fields = frozenset(('sceneID', 'controls'))
+
+
+class ParticipantsMessage(Message):
+    """ParticipantsMessage is an event about a list of participants."""
+    __slots__ = ('participants', '_extra')
+
+    def __init__(self, connection, participants, call_id=0, discard=True):
+        super().__init__(connection, call_id, discard)
+        self.participants = participants
+        self._extra = None
+
+    @classmethod
+    def from_params(cls, connection, params, call_id=0, discard=True):
+        message = cls(connection, tuple(Participant.from_dict(p)
+                                        for p in params['participants']),
+                      call_id, discard)
+        message._extra = _extra(params, participants_fields)
+        return message
+
+    def to_params(self):
+        return _with_extra(
+            {'participants': [p.to_dict() for p in self.participants]},
+            self._extra)
+
+
+class ParticipantJoin(ParticipantsMessage):
+    __slots__ = ()
+    method = 'onParticipantJoin'
+
+
+class ParticipantLeave(ParticipantsMessage):
+    __slots__ = ()
+    method = 'onParticipantLeave'
+
+
+class ParticipantUpdate(ParticipantsMessage):
+    __slots__ = ()
+    method = 'onParticipantUpdate'
+
+
+class ControlUpdate(Message):
+    """ControlUpdate is a change to controls in a scene. Controls vary too
+    much by kind to have fields of their own, so stay as dicts."""
+    __slots__ = ('scene_id', 'controls', '_extra')
+    method = 'onControlUpdate'
+
+    def __init__(self, connection, scene_id, controls, call_id=0,
+                 discard=True):
+        super().__init__(connection, call_id, discard)
+        self.scene_id = scene_id
+        self.controls = controls
+        self._extra = None
+
+    @classmethod
+    def from_params(cls, connection, params, call_id=0, discard=True):
+        message = cls(connection, params['sceneID'], params['controls'],
+                      call_id, discard)
+        message._extra = _extra(params, control_update_fields)
+        return message
+
+    def to_params(self):
+        return _with_extra({'sceneID': self.scene_id,
+                            'controls': self.controls}, self._extra)
+
+
+def _input_type(params):
+    return JoystickInput if params['input'].get('event') == 'move' \
+        else ButtonInput
+
+
+message_types = {
+    'giveInput': _input_type,
+    'onParticipantJoin': lambda params: ParticipantJoin,
+    'onParticipantLeave': lambda params: ParticipantLeave,
+    'onParticipantUpdate': lambda params: ParticipantUpdate,
+    'onControlUpdate': lambda params: ControlUpdate,
+}
+
+
+def decode_message(connection, packet):
+    """
+    Decodes a method packet into its typed Message, or returns None if its
+    method doesn't have one or its params aren't in the expected form.
+    :rtype: Message
+    """
+    choose = message_types.get(packet.get('method'))
+    if choose is None:
+        return None
+
+    params = packet.get('params')
+    try:
+        return choose(params).from_params(
+            connection, params, packet.get('id', 0),
+            packet.get('discard', True))
+    except (KeyError, TypeError, AttributeError):
+        return None
@@ -0,0 +1,188 @@
+import asyncio
+import collections
+
+BLOCK = 'block'
+DROP_OLDEST = 'drop_oldest'
+DROP_NEWEST = 'drop_newest'
+COALESCE = 'coalesce'
+
+overflow_policies = (BLOCK, DROP_OLDEST, DROP_NEWEST, COALESCE)
+
+
+class RecvQueue:
+    """
+    RecvQueue holds Calls which have been read from the socket but not yet
+    consumed. It can be given a maximum length, and one of several policies
+    for what to do when it fills up:
+
+     - ``block`` stops the connection reading from the socket until the
+       consumer catches up. Every packet of the frame being processed is
+       still queued, so the queue may overshoot by up to one frame.
+
+     - ``drop_oldest`` discards the oldest queued call to make room.
+
+     - ``drop_newest`` discards the incoming call.
+
+     - ``coalesce`` merges the incoming call into the latest queued call of
+       the same method, so that only the most recent payload is kept. If
+       no call of that method is queued, the oldest call is dropped instead.
+
+    Shed packets are counted in the given stats counter under
+    ``recv_dropped_oldest``, ``recv_dropped_newest`` and ``recv_coalesced``,
+    and ``recv_blocked`` counts the times the reader had to wait.
+    """
+
+    def __init__(self, maxlen=None, policy=BLOCK, stats=None, loop=None):
+        if policy not in overflow_policies:
+            raise ValueError('Unknown overflow policy {}, expected one of '
+                             '{}'.format(policy, ', '.join(overflow_policies)))
+
+        self._items = collections.deque()
+        self._maxlen = maxlen
+        self._policy = policy
+        self._latest = {}
+        self._space = None
+        self._loop = loop
+        self.stats = stats if stats is not None else collections.Counter()
+
+    def __len__(self):
+        return len(self._items)
+
+    def full(self):
+        """
+        :return: Whether the queue is at or above its maximum length.
+        :rtype: bool
+        """
+        return self._maxlen is not None and len(self._items) >= self._maxlen
+
+    def append(self, call):
+        """
+        Adds a call to the queue, applying the overflow policy if it's full.
+        Returns whether the call was queued as a new entry.
+        :type call: Call
+        :rtype: bool
+        """
+        if self.full() and self._policy != BLOCK:
+            if self._policy == DROP_NEWEST:
+                self.stats['recv_dropped_newest'] += 1
+                return False
+
+            if self._policy == COALESCE:
+                latest = self._latest.get(call.name)
+                if latest is not None and type(latest) is type(call):
+                    latest._assume(call)
+                    self.stats['recv_coalesced'] += 1
+                    return False
+
+            self.popleft()
+            self.stats['recv_dropped_oldest'] += 1
+
+        self._items.append(call)
+        if self._policy == COALESCE:
+            self._latest[call.name] = call
+        return True
+
+    def popleft(self):
+        """
+        Removes and returns the oldest call in the queue.
+        :rtype: Call
+        """
+        call = self._items.popleft()
+        if self._policy == COALESCE and self._latest.get(call.name) is call:
+            del self._latest[call.name]
+
+        if self._space is not None and not self.full():
+            self._space.set_result(None)
+            self._space = None
+
+        return call
+
+    async def wait_for_space(self):
+        """
+        Under the ``block`` policy, waits until the queue is no longer full.
+        Returns immediately under any other policy.
+        """
+        if self._policy != BLOCK:
+            return
+
+        while self.full():
+            self.stats['recv_blocked'] += 1
+            if self._space is None:
+                self._space = asyncio.Future(loop=self._loop)
+            await self._space
+
+
+class SendQueue:
+    """
+    SendQueue holds serialized packets waiting to be written to the socket.
+    It has two lanes: packets in the priority lane are always written before
+    anything in the bulk lane.
+
+    Once the queue reaches its ``high_watermark`` it starts shedding load,
+    dropping any discardable packet (a call made with ``discard=True``)
+    instead of queueing it, until it drains back down to the
+    ``low_watermark``. Other packets are always queued. Counts are kept in
+    the given stats counter: ``send_dropped`` for shed packets,
+    ``send_shedding`` for the number of times shedding started, and
+    ``send_prioritized`` for packets put in the priority lane.
+    """
+
+    def __init__(self, high_watermark, low_watermark=None, stats=None):
+        self._priority = collections.deque()
+        self._bulk = collections.deque()
+        self._high_watermark = high_watermark
+        self._low_watermark = low_watermark if low_watermark is not None \
+            else high_watermark // 2
+        self._shedding = False
+        self.stats = stats if stats is not None else collections.Counter()
+
+    def __len__(self):
+        return len(self._priority) + len(self._bulk)
+
+    @property
+    def shedding(self):
+        """
+        :return: Whether discardable packets are currently being dropped.
+        :rtype: bool
+        """
+        return self._shedding
+
+    def put(self, frame, priority=False, discardable=False):
+        """
+        Queues a serialized packet. Returns whether it was queued, or False
+        if it was shed.
+        :type frame: str
+        :type priority: bool
+        :type discardable: bool
+        :rtype: bool
+        """
+        if not self._shedding and len(self) >= self._high_watermark:
+            self._shedding = True
+            self.stats['send_shedding'] += 1
+
+        if self._shedding and discardable:
+            self.stats['send_dropped'] += 1
+            return False
+
+        if priority:
+            self.stats['send_prioritized'] += 1
+            self._priority.append(frame)
+        else:
+            self._bulk.append(frame)
+        return True
+
+    def take(self, max_n=1):
+        """
+        Removes and returns up to max_n packets, priority lane first.
+        :rtype: list of str
+        """
+        frames = []
+        while len(frames) < max_n and len(self._priority) > 0:
+            frames.append(self._priority.popleft())
+        while len(frames) < max_n and len(self._bulk) > 0:
+            frames.append(self._bulk.popleft())
+
+        if self._shedding and len(self) <= self._low_watermark:
+            self._shedding = False
+
+        return frames
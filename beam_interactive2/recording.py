@@ -0,0 +1,124 @@
+import asyncio
+import os
+import struct
+import time
+
+import websockets
+
+from .capture import SEND, RECV
+
+magic = b'BIREC1\n'
+record_header = struct.Struct('<dBI')
+directions = {RECV: 0, SEND: 1}
+direction_names = {v: k for k, v in directions.items()}
+
+
+class Recorder:
+    """
+    Recorder streams every frame a Connection sends and receives to an
+    append-only file, along with the time it was seen, so that sessions
+    can be replayed later with a ReplaySocket. Assign it to the connection
+    before connecting to capture the handshake as well::
+
+        connection.recorder = Recorder('session.rec')
+        await connection.connect()
+
+    Frames are recorded as JSON text, after decompression, so a recording
+    can be replayed regardless of the compression negotiated in the session
+    it came from. The file is unbuffered, so each frame is written out as
+    it's recorded and a session which crashes keeps everything up to the
+    crash. Connection.close closes the recorder.
+    """
+
+    def __init__(self, path):
+        is_new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = open(path, 'ab', buffering=0)
+        if is_new:
+            self._file.write(magic)
+
+    def record(self, direction, frame):
+        """
+        Appends a frame to the recording.
+        :param direction: Either SEND or RECV
+        :type direction: str
+        :param frame: The frame's JSON text
+        :type frame: str
+        """
+        data = frame.encode('utf-8')
+        self._file.write(record_header.pack(
+            time.time(), directions[direction], len(data)) + data)
+
+    def close(self):
+        self._file.close()
+
+
+def read_recording(path):
+    """
+    Iterates over the (timestamp, direction, frame) tuples in a recording,
+    reading it incrementally.
+    :rtype: Iterator of tuple
+    """
+    with open(path, 'rb') as f:
+        if f.read(len(magic)) != magic:
+            raise ValueError('{} is not a session recording'.format(path))
+
+        while True:
+            header = f.read(record_header.size)
+            if len(header) < record_header.size:
+                return
+
+            timestamp, direction, length = record_header.unpack(header)
+            yield (timestamp, direction_names[direction],
+                   f.read(length).decode('utf-8'))
+
+
+class ReplaySocket:
+    """
+    ReplaySocket plays back the frames received in a recorded session. It
+    can be passed as the ``socket`` of a Connection in place of a real
+    websocket::
+
+        connection = Connection(socket=ReplaySocket('session.rec', speed=2))
+
+    ``speed`` is a multiplier for the original timing of the session, or
+    None to replay as fast as frames can be consumed. Frames the connection
+    sends are counted in ``sent_frames`` and otherwise discarded. Once the
+    recording runs out, the socket behaves as though it had been closed.
+    """
+
+    def __init__(self, path, speed=1.0, loop=None):
+        self._frames = (r for r in read_recording(path) if r[1] == RECV)
+        self._speed = speed
+        self._loop = loop or asyncio.get_event_loop()
+        self._first_timestamp = None
+        self._started_at = None
+        self.sent_frames = 0
+
+    async def recv(self):
+        try:
+            timestamp, _, frame = next(self._frames)
+        except StopIteration:
+            raise websockets.ConnectionClosed(1000, 'end of recording')
+
+        if self._speed is None:
+            # Still yield to the loop, so that consumers get to run.
+            await asyncio.sleep(0, loop=self._loop)
+            return frame
+
+        if self._first_timestamp is None:
+            self._first_timestamp = timestamp
+            self._started_at = self._loop.time()
+
+        due = self._started_at + \
+            (timestamp - self._first_timestamp) / self._speed
+        delay = due - self._loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay, loop=self._loop)
+
+        return frame
+
+    async def send(self, data):
+        self.sent_frames += 1
+
+    async def close(self):
+        self._frames.close()
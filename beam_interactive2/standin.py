@@ -0,0 +1,319 @@
+import asyncio
+import collections
+import heapq
+import random
+import time
+
+import websockets
+
+from ._util import random_string
+from .codec import JsonCodec
+from .encoding import TextEncoding, GzipEncoding, DictionaryEncoding
+from .log import logger
+from . import traffic
+from .transport import websocket_kwargs
+
+unknown_method_error = {'code': 4006, 'message': 'Unknown method name'}
+
+
+class StandInServer:
+    """
+    StandInServer is a local websocket server which speaks enough of the
+    Interactive protocol for a Connection or State to run against it. It's
+    meant for load testing clients without any network. Example::
+
+        server = StandInServer()
+        await server.start()
+        state = await State.connect(address=server.address)
+        await server.swarm(size=1000, input_rate=500).run(duration=10)
+
+    It greets clients with ``hello``, negotiates ``setCompression`` (text,
+    gzip, and zdict using ``dictionary``, or the default one), answers ``getScenes``, ``getGroups``, ``getTime`` and
+    ``getAllParticipants``, and accepts ``updateControls``, ``capture`` and
+    ``ready``. Every method received is counted in ``stats``.
+
+    ``transport_compression`` configures permessage-deflate as it does for
+    a Connection: a PerMessageDeflate to accept, or False to refuse it.
+
+    ``getAllParticipants`` returns those connected at or after its
+    ``from``, oldest first, in pages of at most ``page_size``.
+
+    With a ``latency``, in seconds, each reply is sent that long after its
+    call arrives, as though it had crossed a network. Calls are still read
+    as soon as they're sent, so concurrent calls wait concurrently.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, scenes=None, groups=None,
+                 dictionary=None, transport_compression=None, latency=0,
+                 page_size=None, loop=None):
+        self._host = host
+        self.latency = latency
+        self.page_size = page_size
+        self._transport_compression = transport_compression
+        self._port = port
+        self._loop = loop or asyncio.get_event_loop()
+        self._server = None
+        self._sessions = set()
+        self.scenes = scenes if scenes is not None else \
+            traffic.default_scenes()
+        self.groups = groups if groups is not None else \
+            [{'groupID': 'default', 'sceneID': 'default', 'etag': ''}]
+        self.participants = {}
+        self.stats = collections.Counter()
+        self.compression_schemes = {
+            'text': TextEncoding,
+            'gzip': GzipEncoding,
+            'zdict': lambda: DictionaryEncoding(dictionary),
+        }
+        self.handlers = {
+            'getScenes': lambda params: {'scenes': self.scenes},
+            'getGroups': lambda params: {'groups': self.groups},
+            'getTime': lambda params: {'time': int(time.time() * 1000)},
+            'getAllParticipants': self._get_all_participants,
+            'updateControls': lambda params: None,
+            'capture': lambda params: None,
+            'ready': lambda params: None,
+        }
+
+    @property
+    def address(self):
+        """
+        :return: The websocket address clients should connect to.
+        :rtype: str
+        """
+        host, port = self._server.server.sockets[0].getsockname()[:2]
+        return 'ws://{}:{}'.format(host, port)
+
+    async def start(self):
+        """Starts listening for connections."""
+        self._server = await websockets.serve(
+            self._handle, self._host, self._port, loop=self._loop,
+            **websocket_kwargs(self._transport_compression, server=True))
+
+    async def close(self):
+        """Stops the server and disconnects all clients."""
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def disconnect_all(self):
+        """Drops every connected client, leaving the server running."""
+        for session in list(self._sessions):
+            await session.close()
+
+    async def broadcast(self, packet):
+        """
+        Sends a packet to every connected client.
+        :type packet: dict
+        """
+        for session in list(self._sessions):
+            await session.send(packet)
+
+    def swarm(self, **kwargs):
+        """
+        Creates a ParticipantSwarm which sends its traffic to this server's
+        clients. Arguments are passed through to ParticipantSwarm.
+        :rtype: ParticipantSwarm
+        """
+        return ParticipantSwarm(self, loop=self._loop, **kwargs)
+
+    def _get_all_participants(self, params):
+        since = params.get('from', 0)
+        found = [p for p in self.participants.values()
+                 if p.get('connectedAt', 0) >= since]
+        page = found if self.page_size is None else heapq.nsmallest(
+            self.page_size, found, key=lambda p: p.get('connectedAt', 0))
+        return {'participants': page, 'total': len(self.participants),
+                'hasMore': len(page) < len(found)}
+
+    async def _handle(self, socket, path=None):
+        session = StandInSession(self, socket)
+        self._sessions.add(session)
+        try:
+            await session.run()
+        finally:
+            self._sessions.discard(session)
+
+
+class StandInSession:
+    """StandInSession is a single client connected to a StandInServer."""
+
+    def __init__(self, server, socket):
+        self._server = server
+        self._socket = socket
+        self._encoding = TextEncoding()
+        self._codec = JsonCodec()
+
+    async def send(self, packet):
+        try:
+            await self._socket.send(
+                self._encoding.encode(self._codec.dumps(packet)))
+        except websockets.ConnectionClosed:
+            pass
+
+    async def close(self):
+        await self._socket.close()
+
+    async def run(self):
+        await self.send(traffic.method('hello', {}))
+        while True:
+            try:
+                data = await self._socket.recv()
+            except websockets.ConnectionClosed:
+                return
+
+            if not isinstance(data, str):
+                data = self._encoding.decode(data)
+
+            packets = self._codec.loads(data)
+            if not isinstance(packets, list):
+                packets = [packets]
+
+            for packet in packets:
+                await self._handle(packet)
+
+    async def _handle(self, packet):
+        if packet.get('type') != 'method':
+            return
+
+        name = packet['method']
+        self._server.stats[name] += 1
+        reply = {'type': 'reply', 'id': packet.get('id')}
+        switch_to = None
+
+        if name == 'setCompression':
+            schemes = packet['params'].get('scheme', [])
+            supported = self._server.compression_schemes
+            scheme = next((s for s in schemes if s in supported),
+                          self._encoding.name())
+            reply['result'] = {'scheme': scheme}
+            if scheme != self._encoding.name():
+                switch_to = supported[scheme]()
+        elif name in self._server.handlers:
+            reply['result'] = self._server.handlers[name](packet['params'])
+        else:
+            logger.info('stand-in server got unknown method %s', name)
+            reply['error'] = unknown_method_error
+
+        if self._server.latency > 0:
+            asyncio.ensure_future(self._reply_later(packet, reply, switch_to),
+                                  loop=self._server._loop)
+        else:
+            await self._reply(packet, reply, switch_to)
+
+    async def _reply_later(self, packet, reply, switch_to):
+        # Replies all wait the same time, so they still go out in order.
+        await asyncio.sleep(self._server.latency, loop=self._server._loop)
+        await self._reply(packet, reply, switch_to)
+
+    async def _reply(self, packet, reply, switch_to):
+        if not packet.get('discard'):
+            await self.send(reply)
+
+        if switch_to is not None:
+            self._encoding = switch_to
+
+
+class ParticipantSwarm:
+    """
+    ParticipantSwarm drives scripted participants on a StandInServer. It
+    keeps ``size`` participants joined, and each second sends roughly
+    ``input_rate`` button presses and ``move_rate`` joystick moves from
+    random participants, while ``leave_rate`` participants leave and are
+    replaced. ``join_rate`` bounds how quickly participants join.
+
+    The loop time each button press was sent is kept in ``sent_at`` under
+    its transactionID, so clients can measure end-to-end latency.
+    """
+
+    def __init__(self, server, size=100, join_rate=100, leave_rate=0,
+                 input_rate=10, move_rate=0, buttons=None, joysticks=None,
+                 loop=None):
+        controls = server.scenes[0]['controls'] if server.scenes else []
+        self._server = server
+        self._loop = loop or asyncio.get_event_loop()
+        self._size = size
+        self._rates = {'join': join_rate, 'leave': leave_rate,
+                       'input': input_rate, 'move': move_rate}
+        self._owed = collections.Counter()
+        self._buttons = buttons or [c['controlID'] for c in controls
+                                    if c['kind'] == 'button']
+        self._joysticks = joysticks or [c['controlID'] for c in controls
+                                        if c['kind'] == 'joystick']
+        self._pressed = set()
+        self.sent_at = {}
+        self.stats = collections.Counter()
+
+    def _take(self, kind, interval):
+        """
+        Returns how many events of the kind are due in this interval,
+        carrying any fraction over to the next.
+        """
+        self._owed[kind] += self._rates[kind] * interval
+        count = int(self._owed[kind])
+        self._owed[kind] -= count
+        return count
+
+    async def run(self, duration, interval=0.01):
+        """
+        Sends traffic for the given duration, in seconds, in bursts every
+        ``interval`` seconds.
+        """
+        start = self._loop.time()
+        ticks = 0
+        while self._loop.time() - start < duration:
+            await self.tick(interval)
+            ticks += 1
+            delay = start + ticks * interval - self._loop.time()
+            await asyncio.sleep(max(0, delay), loop=self._loop)
+
+    async def tick(self, interval):
+        """Sends the traffic due in a single interval."""
+        participants = self._server.participants
+
+        leaving = min(self._take('leave', interval), len(participants))
+        if leaving > 0:
+            gone = [participants.pop(k) for k in
+                    random.sample(list(participants), leaving)]
+            self.stats['leave'] += leaving
+            await self._server.broadcast(traffic.participant_leave(gone))
+
+        joining = min(self._take('join', interval),
+                      self._size - len(participants))
+        if joining > 0:
+            joined = [traffic.participant() for _ in range(joining)]
+            for p in joined:
+                participants[p['sessionID']] = p
+            self.stats['join'] += joining
+            await self._server.broadcast(traffic.participant_join(joined))
+
+        if len(participants) == 0:
+            return
+
+        session_ids = list(participants)
+        for _ in range(self._take('input', interval)):
+            await self._press(random.choice(session_ids))
+        for _ in range(self._take('move', interval)):
+            if len(self._joysticks) > 0:
+                self.stats['move'] += 1
+                await self._server.broadcast(traffic.joystick_input(
+                    random.choice(session_ids),
+                    random.choice(self._joysticks)))
+
+    async def _press(self, session_id):
+        if len(self._buttons) == 0:
+            return
+
+        control_id = random.choice(self._buttons)
+        key = (session_id, control_id)
+        if key in self._pressed:
+            self._pressed.discard(key)
+            packet = traffic.button_input(session_id, control_id, 'mouseup')
+        else:
+            self._pressed.add(key)
+            transaction_id = random_string(16)
+            self.sent_at[transaction_id] = self._loop.time()
+            packet = traffic.button_input(session_id, control_id,
+                                          'mousedown', transaction_id)
+
+        self.stats['input'] += 1
+        await self._server.broadcast(packet)
@@ -1,14 +1,109 @@
 import collections
 import asyncio
 import time
-from pyee import EventEmitter
+import weakref
 
 from .connection import Call, Connection
 from .discovery import Discovery
+from .dispatch import DispatchEmitter
+from .log import logger
 from .scene import Scene
 
 
-class State(EventEmitter):
+class HandledMethods:
+    """A live view of the methods a State has listeners for."""
+
+    def __init__(self, state):
+        self._state = state
+
+    def __contains__(self, name):
+        return bool(self._state._events.get(name))
+
+
+class ParticipantPages:
+    """
+    ParticipantPages pages through getAllParticipants, storing each page
+    in its State's ``participants`` as it's read. It's an async iterator
+    of the pages, each a dict of the participants stored, keyed by their
+    sessionID::
+
+        async for page in state.participant_pages():
+            print('{} participants so far'.format(len(state.participants)))
+
+    Pages are requested by the ``connectedAt`` of the last participant
+    in the previous page, and their size is up to the service. Join,
+    leave and update events keep being applied while pages load. If an
+    event for a participant is applied after a page was requested, they're
+    left out of that page, since the event is at least as new. The
+    counts of participants ``loaded`` and ``skipped`` for this reason are
+    kept, along with the number of ``pages``.
+
+    :param state: The state to fill
+    :type state: State
+    :param since: Only load participants who connected at or after this
+                  unix milliseconds timestamp
+    :type since: int
+    """
+
+    def __init__(self, state, since=0):
+        self._state = state
+        self._from = since
+        self._done = False
+        self._touched = set()
+        self.pages = 0
+        self.loaded = 0
+        self.skipped = 0
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._done:
+            raise StopAsyncIteration
+
+        # Events applied from here on are at least as new as the page.
+        self._touched.clear()
+        self._state._participant_pages.add(self)
+        page = {}
+        received, latest = 0, self._from
+
+        def store(participant):
+            nonlocal received, latest
+            received += 1
+            latest = max(latest, participant.get('connectedAt', 0))
+            session_id = participant.pop('sessionID')
+            if session_id in self._touched:
+                self.skipped += 1
+                return
+            page[session_id] = participant
+            self._state.participants[session_id] = participant
+
+        try:
+            result = await self._state._connection.call(
+                'getAllParticipants', {'from': self._from},
+                sinks={'participants': store})
+        except Exception:
+            self._done = True
+            raise
+        finally:
+            self._state._participant_pages.discard(self)
+
+        self.pages += 1
+        self.loaded += len(page)
+        if not result.get('hasMore') or received == 0:
+            self._done = True
+        elif latest > self._from:
+            # The service includes participants who connected at ``from``,
+            # so those in the last millisecond are read again and deduped.
+            self._from = latest
+        else:
+            logger.warning('a whole page of participants connected at %s, '
+                           'skipping past them', self._from)
+            self._from += 1
+        return page
+
+
+class State(DispatchEmitter):
     """State is the state container for a single interactive session.
     It should usually be created via the static ``connect`` method::
 
@@ -37,26 +132,32 @@ class State(EventEmitter):
             # for call in pump(): ...
 
     In both modes, all incoming call are emitted as events on the State
-    instance.
+    instance. It's a pyee EventEmitter, dispatching through the compiled
+    tables of a DispatchEmitter.
 
     :param connection: The websocket connection to interactive.
     :type connection: Connection
     """
 
     def __init__(self, connection):
-        super(State, self).__init__()
+        super(State, self).__init__(loop=connection._loop)
         self._scenes = {}
         self._connection = connection
         self._enable_event_queue = True
         self._event_queue = collections.deque()
+        self.pump_batch_size = 256
         self.participants = {}
+        self.groups = {}
         self.time_offset = 0
+        self.startup_timings = collections.OrderedDict()
+        self._participant_pages = weakref.WeakSet()
         self._controls = {}
         self.on('onParticipantJoin', self._on_participant_join)
         self.on('onParticipantLeave', self._on_participant_leave)
         self.on("onParticipantUpdate", self._on_participant_update)
         self.on('onControlUpdate', self._on_control_update)
         #self.on('giveInput', self._give_input)
+        connection.add_reconnect_handler(self._resync)
 
     @property
     def scenes(self):
@@ -87,10 +188,15 @@ class State(EventEmitter):
         print("<{}> {}'ed {}".format(username, packet["input"]["event"], packet["input"]["controlID"]))
 
 
+    def _touch_participant(self, sessionID):
+        for pages in self._participant_pages:
+            pages._touched.add(sessionID)
+
     def _on_participant_join(self, call):
         packet = call.data
         for participant in packet["participants"]:
             sessionID = participant["sessionID"]
+            self._touch_participant(sessionID)
             del participant["sessionID"]
             self.participants[sessionID] = participant
         names = [p["username"] for p in packet["participants"]]
@@ -100,7 +206,9 @@ class State(EventEmitter):
     def _on_participant_leave(self, call):
         packet = call.data
         for participant in packet["participants"]:
-            del self.participants[participant["sessionID"]]
+            self._touch_participant(participant["sessionID"])
+            # We may not know about them if we joined after they did.
+            self.participants.pop(participant["sessionID"], None)
 
         names = [p["username"] for p in packet["participants"]]
         print("[{}] left".format(", ".join(names)))
@@ -109,6 +217,7 @@ class State(EventEmitter):
         packet = call.data
         for participant in packet["participants"]:
             sessionID = participant["sessionID"]
+            self._touch_participant(sessionID)
             del participant["sessionID"]
             self.participants[sessionID] = participant
         names = [p["username"] for p in packet["participants"]]
@@ -138,6 +247,7 @@ class State(EventEmitter):
 
         async def run():
             try:
+                self.pump()  # anything queued before we started
                 while await self._connection.has_packet():
                     self.pump()
             except asyncio.CancelledError:
@@ -145,6 +255,19 @@ class State(EventEmitter):
 
         return asyncio.ensure_future(run(), loop=loop)
 
+    def drop_unhandled(self, enabled=True):
+        """
+        Has the connection drop calls to methods this state has no
+        listeners for, before they're queued. Combined with the
+        connection's ``lazy_calls``, they aren't even parsed. Calls dropped
+        this way won't appear in the queue pump() returns either.
+
+        :param enabled: False to receive every call again
+        :type enabled: bool
+        """
+        self._connection.method_filter = HandledMethods(self) \
+            if enabled else None
+
     def pump(self):
         """
         pump causes the state to read any updates it has queued up. This
@@ -160,29 +283,129 @@ class State(EventEmitter):
         """
         self._event_queue.clear()
         while True:
-            call = self._connection.get_packet()
-            if call is None:
-                return
+            calls = self._connection.get_packets(self.pump_batch_size)
+            if len(calls) == 0:
+                return self._event_queue
 
-            self.emit(call.name, call)
+            for call in calls:
+                self.emit(call.name, call)
 
             if self._enable_event_queue:
-                self._event_queue.append(call)
-
-        return self._event_queue
+                self._event_queue.extend(calls)
 
     async def get_scenes(self):
         """
         calls getScenes and stores the scenes in an easily accessible list. It is stored in self._scenes.
-        Scenes can be accessed like self._scenes["default"]
+        Scenes can be accessed like self._scenes["default"]. Scenes are
+        stored one at a time as they're read off the reply.
         """
-        packet = await self._connection.call("getScenes")
-
-        scenes = packet["scenes"]
-        for scene in scenes:
+        def store(scene):
             sceneID = scene.pop("sceneID")
             self._scenes[sceneID] = scene
-            return self._scenes
+
+        await self._connection.call("getScenes", sinks={"scenes": store})
+        return self._scenes
+
+    async def get_groups(self):
+        """
+        calls getGroups and stores the groups in self.groups, keyed by their groupID.
+        """
+        packet = await self._connection.call("getGroups")
+        self.groups = {g["groupID"]: g for g in packet["groups"]}
+        return self.groups
+
+    async def get_participants(self):
+        """
+        Loads everyone who is connected into self.participants, a page of
+        getAllParticipants at a time (see participant_pages). Join, leave and
+        update events applied while it loads are kept, and participants left
+        over from before who weren't in any page are removed.
+        """
+        known = dict(self.participants)
+        loaded = set()
+        async for page in self.participant_pages():
+            loaded.update(page)
+
+        for sessionID, participant in known.items():
+            if sessionID not in loaded and \
+                    self.participants.get(sessionID) is participant:
+                del self.participants[sessionID]
+        return self.participants
+
+    async def bootstrap(self, compression=None, ready=False):
+        """
+        Fills the state after connecting. getTime, getScenes, getGroups and
+        getAllParticipants, and setCompression if a ``compression`` scheme
+        is given, are all sent at once rather than one after another, so
+        that startup takes about one round trip rather than one per call.
+        Participants beyond the first page take a round trip per page.
+
+        How long each call took, and the whole bootstrap, are stored in
+        ``startup_timings`` in seconds, after any stages of ``connect``.
+
+        :param compression: The compression scheme to negotiate, if any
+        :type compression: Encoding
+        :param ready: True to call ``ready`` once the state is filled
+        :type ready: bool
+        :return: startup_timings
+        :rtype: collections.OrderedDict
+        """
+        stages = [('getTime', self.sync_time()),
+                  ('getScenes', self.get_scenes()),
+                  ('getGroups', self.get_groups()),
+                  ('getAllParticipants', self.get_participants())]
+        if compression is not None:
+            stages.insert(0, ('setCompression',
+                              self._connection.set_compression(compression)))
+
+        timings = self.startup_timings
+
+        async def timed(name, call):
+            began = time.perf_counter()
+            try:
+                return await call
+            finally:
+                timings[name] = time.perf_counter() - began
+
+        start = time.perf_counter()
+        results = await asyncio.gather(
+            *(timed(name, call) for name, call in stages),
+            loop=self._connection._loop, return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+
+        if ready:
+            await timed('ready', self._connection.call(
+                'ready', {'isReady': True}))
+        timings['bootstrap'] = time.perf_counter() - start
+
+        logger.info('startup took %s', ', '.join(
+            '{} {:.0f}ms'.format(name, seconds * 1000)
+            for name, seconds in timings.items()))
+        return timings
+
+    def participant_pages(self, since=0):
+        """
+        Returns an async iterator which pages through everyone connected,
+        adding them to self.participants a page at a time, while join and
+        leave events keep being applied. See ParticipantPages.
+
+        :param since: Only load participants who connected at or after this
+                      unix milliseconds timestamp
+        :rtype: ParticipantPages
+        """
+        return ParticipantPages(self, since)
+
+    async def _resync(self):
+        """
+        Re-fetches scenes, groups and participants after the connection reconnects.
+        Participants are paged through with participant_pages, and those who
+        left while the connection was down are removed.
+        """
+        await self.get_scenes()
+        await self.get_groups()
+        await self.get_participants()
 
     async def get_scene(self, group=None, username=None, userID=None):
         await self.get_scenes()
@@ -293,16 +516,25 @@ class State(EventEmitter):
     async def connect(discovery=Discovery(), **kwargs):
         """
         Creates a new interactive connection. Most arguments will be passed
-        through into the Connection constructor.
+        through into the Connection constructor. How long discovery and
+        connecting took is stored in the state's ``startup_timings``.
 
         :param discovery:
         :param kwargs:
         :return:
         """
 
+        timings = collections.OrderedDict()
         if 'address' not in kwargs:
+            start = time.perf_counter()
             kwargs['address'] = await discovery.find()
+            timings['discovery'] = time.perf_counter() - start
 
+        start = time.perf_counter()
         connection = Connection(**kwargs)
         await connection.connect()
-        return State(connection)
+        timings['connect'] = time.perf_counter() - start
+
+        state = State(connection)
+        state.startup_timings.update(timings)
+        return state
@@ -0,0 +1,211 @@
+"""
+Incremental parsing for large replies. See ``Connection.call``'s ``sinks``
+and ``Connection(stream_threshold=...)``.
+"""
+import copy
+import json
+import re
+
+# The text decoded and parsed at a time.
+chunk_size = 64 * 1024
+
+# The tokens we need to follow the structure of a reply. A lone quote only
+# matches where a string isn't terminated yet, so we wait for more text.
+token_pattern = re.compile(r'"(?:[^"\\]|\\.)*"|"|[\[\]{}:,]')
+separators = re.compile(r'[ \t\n\r,]*')
+item_decoder = json.JSONDecoder()
+
+
+class ReplyStream:
+    """
+    ReplyStream parses a JSON reply as its text is fed in chunks. The items
+    of each array ``result[key]``, where ``key`` is in the sinks of the
+    call being replied to, are parsed as they arrive and passed one at a
+    time to ``sinks[key]`` rather than kept, so no more than about a
+    chunk's worth of them is held at once. ``close`` returns the text of
+    the rest of the reply, with those arrays left empty.
+
+    The sinks are looked up with ``route(call_id)`` once the reply's ``id``
+    has been read. Arrays which come before the ``id`` are kept in the
+    reply as they are.
+
+    :param route: Function from a call ID to its dict of sinks, or None
+    """
+
+    def __init__(self, route):
+        self._route = route
+        self._sinks = None
+        self._sink = None
+        self._stack = []
+        self._key = None
+        self._id_text = None
+        self._pending = ''
+        self._skeleton = []
+        self.streamed = 0
+
+    def feed(self, text):
+        """
+        Parses the next chunk of the reply's text.
+        :type text: str
+        """
+        pending = self._pending + text if self._pending else text
+        pos, end = 0, len(pending)
+        while pos < end:
+            if self._sink is not None:
+                pos = self._read_items(pending, pos)
+                if self._sink is not None:
+                    break  # waiting for the rest of an item
+                continue
+
+            match = token_pattern.search(pending, pos)
+            if match is None:
+                self._write(pending[pos:])
+                pos = end
+                break
+
+            token = match.group()
+            if token == '"':
+                break
+            self._write(pending[pos:match.start()])
+            pos = match.end()
+            self._token(token)
+
+        self._pending = pending[pos:]
+
+    def _write(self, text):
+        if text:
+            self._skeleton.append(text)
+            if self._id_text is not None:
+                self._id_text.append(text)
+
+    def _token(self, token):
+        stack = self._stack
+        if self._id_text is not None and len(stack) == 1 and \
+                (token == ',' or token == '}'):
+            self._read_id()
+
+        self._write(token)
+        if token[0] == '"':
+            self._key = token
+        elif token == ':':
+            stack[-1] = json.loads(self._key)
+            if len(stack) == 1 and stack[-1] == 'id':
+                self._id_text = []
+        elif token == '{' or token == '[':
+            sink = None
+            if token == '[' and self._sinks is not None and \
+                    len(stack) == 2 and stack[0] == 'result':
+                sink = self._sinks.get(stack[1])
+            stack.append(None)
+            self._sink = sink
+        elif token == '}' or token == ']':
+            stack.pop()
+
+    def _read_id(self):
+        try:
+            call_id = json.loads(''.join(self._id_text))
+        except ValueError:
+            call_id = None
+        self._id_text = None
+        self._sinks = self._route(call_id)
+
+    def _read_items(self, pending, pos):
+        """
+        Passes the complete items in pending from pos to the sink, and
+        returns where it stopped.
+        """
+        pos = separators.match(pending, pos).end()
+        items, pos = self._parse_items(pending, pos)
+        for item in items:
+            self._sink(item)
+        self.streamed += len(items)
+
+        pos = separators.match(pending, pos).end()
+        if pos < len(pending) and pending[pos] == ']':
+            self._skeleton.append(']')
+            self._stack.pop()
+            self._sink = None
+            pos += 1
+        return pos
+
+    def _parse_items(self, pending, pos):
+        """
+        Returns the complete items in pending from pos, and where they end.
+        Runs of items are parsed together, so that their keys are shared.
+        """
+        # Usually the items are objects, and the last brace ends one. If
+        # it's anywhere else, the text up to it isn't a valid array.
+        cut = pending.rfind('}', pos) + 1
+        if cut > pos:
+            try:
+                return json.loads('[' + pending[pos:cut] + ']'), cut
+            except ValueError:
+                pass
+
+        end = pos
+        while True:
+            start = separators.match(pending, end).end()
+            try:
+                item, item_end = item_decoder.raw_decode(pending, start)
+            except ValueError:
+                break  # incomplete, or the end of the array
+            if item_end == len(pending) and \
+                    not isinstance(item, (dict, list, str)):
+                break  # a number or literal may continue
+            end = item_end
+
+        if end == pos:
+            return [], pos
+        return json.loads('[' + pending[pos:end] + ']'), end
+
+    def close(self):
+        """
+        Returns the text of the rest of the reply.
+        :rtype: str
+        """
+        if self._sink is not None:
+            raise ValueError('reply ended inside a streamed array')
+        self._skeleton.append(self._pending)
+        self._pending = ''
+        return ''.join(self._skeleton)
+
+
+class SinkFanOut:
+    """
+    SinkFanOut shares the sinks of one call between the callers whose
+    calls were collapsed into it. Each item is passed to every caller's sink
+    of the same name: the last caller gets the item itself and the others
+    their own copies, since sinks such as State's keep what they're given.
+    A caller whose sink raises gets no more items, and its error is kept in
+    ``errors`` rather than failing the other callers.
+
+    :param names: The names of the arrays being streamed
+    """
+
+    def __init__(self, names):
+        self.sinks = {name: self._fan_out(name) for name in names}
+        self.errors = {}
+        self._callers = []
+
+    def add(self, sinks):
+        """
+        Adds a caller's sinks, keyed by the same names.
+        :return: The caller's key in ``errors``
+        :rtype: int
+        """
+        self._callers.append(sinks)
+        return len(self._callers) - 1
+
+    def _fan_out(self, name):
+        def sink(item):
+            callers = [(index, sinks) for index, sinks
+                       in enumerate(self._callers) if index not in self.errors]
+            for index, sinks in callers:
+                given = item if index == callers[-1][0] else \
+                    copy.deepcopy(item)
+                try:
+                    sinks[name](given)
+                except Exception as e:
+                    self.errors[index] = e
+
+        return sink
@@ -0,0 +1,77 @@
+import asyncio
+import math
+
+
+class TimeoutWheel:
+    """
+    TimeoutWheel expires futures after a timeout using a single timer handle
+    shared across every future it tracks. Deadlines are rounded up into
+    slots ``resolution`` seconds wide, and all futures in a slot are failed
+    with an asyncio.TimeoutError together. This is much cheaper than
+    asyncio.wait_for when thousands of calls are in flight, at the cost of
+    timeouts firing up to ``resolution`` seconds late.
+
+    Futures which complete before their deadline are dropped from their
+    slot as they complete, so their results aren't kept alive until then.
+    """
+
+    def __init__(self, loop, resolution=0.05):
+        self._loop = loop
+        self._resolution = resolution
+        self._slots = {}
+        self._handle = None
+        self._next_slot = None
+
+    def __len__(self):
+        return sum(len(slot) for slot in self._slots.values())
+
+    def add(self, future, timeout):
+        """
+        Fails the future with an asyncio.TimeoutError if it's not done
+        within the timeout, given in seconds.
+        :type future: asyncio.Future
+        :type timeout: float
+        """
+        slot_id = math.ceil((self._loop.time() + timeout) / self._resolution)
+        slot = self._slots.get(slot_id)
+        if slot is None:
+            slot = self._slots[slot_id] = set()
+        slot.add(future)
+        future.add_done_callback(
+            lambda future: self._discard(slot_id, future))
+
+        if self._next_slot is None or slot_id < self._next_slot:
+            self._schedule(slot_id)
+
+    def _discard(self, slot_id, future):
+        slot = self._slots.get(slot_id)
+        if slot is None:
+            return  # already expired
+        slot.discard(future)
+        if not slot:
+            del self._slots[slot_id]
+
+    def _schedule(self, slot_id):
+        if self._handle is not None:
+            self._handle.cancel()
+
+        self._next_slot = slot_id
+        self._handle = self._loop.call_at(slot_id * self._resolution,
+                                          self._expire)
+
+    def _expire(self):
+        """
+        Fails all futures in slots which are now due, and schedules the
+        next wakeup, if there is anything left to wait on.
+        """
+        due_slot = self._next_slot
+        self._handle = None
+        self._next_slot = None
+
+        for slot_id in [s for s in self._slots if s <= due_slot]:
+            for future in self._slots.pop(slot_id):
+                if not future.done():
+                    future.set_exception(asyncio.TimeoutError())
+
+        if len(self._slots) > 0:
+            self._schedule(min(self._slots))
@@ -0,0 +1,267 @@
+"""
+Builders for the packets the Interactive service sends to game clients,
+and synthetic sources of that traffic. These are used by the stand-in
+server and benchmarks to produce realistic traffic without a connection
+to the real service.
+"""
+import asyncio
+import random
+import time
+
+import websockets
+
+from ._util import random_etag, random_string
+from .codec import default_codec
+
+
+def method(name, params, discard=True):
+    """
+    Builds a method packet, as sent from the service.
+    :rtype: dict
+    """
+    return {'type': 'method', 'method': name, 'params': params,
+            'id': 0, 'discard': discard}
+
+
+def participant(session_id=None, user_id=None, username=None,
+                group_id='default'):
+    """
+    Builds a participant resource with randomized defaults.
+    :rtype: dict
+    """
+    now = int(time.time() * 1000)
+    return {
+        'sessionID': session_id or random_string(16),
+        'userID': user_id or random.randint(1, 10000000),
+        'username': username or random_string(10).lower(),
+        'level': random.randint(1, 100),
+        'lastInputAt': now,
+        'connectedAt': now,
+        'disabled': False,
+        'groupID': group_id,
+        'etag': random_etag(),
+    }
+
+
+def participant_join(participants):
+    return method('onParticipantJoin', {'participants': participants})
+
+
+def participant_leave(participants):
+    return method('onParticipantLeave', {'participants': participants})
+
+
+def participant_update(participants):
+    return method('onParticipantUpdate', {'participants': participants})
+
+
+def button_input(session_id, control_id, event='mousedown',
+                 transaction_id=None):
+    """
+    Builds a giveInput packet for a button press or release.
+    :rtype: dict
+    """
+    params = {
+        'participantID': session_id,
+        'input': {'controlID': control_id, 'event': event, 'button': 0},
+    }
+    if transaction_id is not None:
+        params['transactionID'] = transaction_id
+
+    return method('giveInput', params)
+
+
+def joystick_input(session_id, control_id, x=None, y=None):
+    """
+    Builds a giveInput packet for a joystick move, with a random position
+    if none is given.
+    :rtype: dict
+    """
+    return method('giveInput', {
+        'participantID': session_id,
+        'input': {
+            'controlID': control_id,
+            'event': 'move',
+            'x': random.uniform(-1, 1) if x is None else x,
+            'y': random.uniform(-1, 1) if y is None else y,
+        },
+    })
+
+
+def control_update(scene_id, controls):
+    return method('onControlUpdate', {'sceneID': scene_id,
+                                      'controls': controls})
+
+
+def default_scenes():
+    """
+    Returns a default scene with a few buttons and a joystick, in the form
+    returned from getScenes.
+    :rtype: list of dict
+    """
+    controls = [
+        {'controlID': control_id, 'kind': 'button', 'text': control_id,
+         'cost': 0, 'cooldown': 0, 'disabled': False, 'etag': random_etag()}
+        for control_id in ('W', 'A', 'S', 'D', 'Jump')
+    ]
+    controls.append({'controlID': 'joystick', 'kind': 'joystick',
+                     'sampleRate': 50, 'disabled': False,
+                     'etag': random_etag()})
+
+    return [{'sceneID': 'default', 'controls': controls, 'etag': random_etag(),
+             'meta': {}}]
+
+
+default_mix = {
+    'giveInput': 0.85,
+    'onParticipantUpdate': 0.05,
+    'onParticipantJoin': 0.03,
+    'onParticipantLeave': 0.02,
+    'onControlUpdate': 0.05,
+}
+
+
+class SyntheticTraffic:
+    """
+    SyntheticTraffic generates a realistic mix of packets from a simulated
+    audience of ``participants``. ``mix`` maps method names to their share
+    of the traffic; see ``default_mix``. Joins and leaves keep the audience
+    roughly the same size, and leaves only name participants which are
+    currently present.
+
+    ``joystick_share`` is the fraction of inputs which are joystick moves,
+    rather than button presses.
+
+    Each packet gets a sequence number under ``params['seq']``, so that
+    consumers can look up when it was produced in ``produced_at``.
+    """
+
+    def __init__(self, participants=1000, mix=None, scenes=None,
+                 joystick_share=0.5):
+        self.population = {}
+        for _ in range(participants):
+            p = participant()
+            self.population[p['sessionID']] = p
+
+        self._session_ids = list(self.population)
+        mix = mix or default_mix
+        self._methods = list(mix)
+        self._weights = [mix[m] for m in self._methods]
+        scenes = scenes or default_scenes()
+        self._scene_id = scenes[0]['sceneID']
+        self._controls = scenes[0]['controls']
+        self._buttons = [c['controlID'] for c in self._controls
+                         if c['kind'] == 'button']
+        self._joysticks = [c['controlID'] for c in self._controls
+                           if c['kind'] == 'joystick']
+        self._joystick_share = joystick_share
+        self._seq = 0
+        self.produced_at = {}
+
+    def _random_participant(self):
+        # Sessions which have left are removed lazily, since removing
+        # from the middle of the list is O(n).
+        while True:
+            i = random.randrange(len(self._session_ids))
+            session_id = self._session_ids[i]
+            if session_id in self.population:
+                return session_id
+            self._session_ids[i] = self._session_ids[-1]
+            self._session_ids.pop()
+
+    def next_packet(self):
+        """
+        Returns the next packet in the stream.
+        :rtype: dict
+        """
+        name = self._weighted_choice()
+        if name == 'onParticipantLeave' and len(self.population) <= 1:
+            name = 'onParticipantJoin'
+
+        if name == 'giveInput':
+            session_id = self._random_participant()
+            if len(self._joysticks) > 0 and \
+                    random.random() < self._joystick_share:
+                packet = joystick_input(session_id,
+                                        random.choice(self._joysticks))
+            else:
+                packet = button_input(
+                    session_id, random.choice(self._buttons),
+                    random.choice(('mousedown', 'mouseup')))
+        elif name == 'onParticipantJoin':
+            p = participant()
+            self.population[p['sessionID']] = p
+            self._session_ids.append(p['sessionID'])
+            packet = participant_join([dict(p)])
+        elif name == 'onParticipantLeave':
+            p = self.population.pop(self._random_participant())
+            packet = participant_leave([dict(p)])
+        elif name == 'onParticipantUpdate':
+            p = self.population[self._random_participant()]
+            p['level'] += 1
+            packet = participant_update([dict(p)])
+        else:
+            control = dict(random.choice(self._controls))
+            control['disabled'] = random.random() < 0.5
+            packet = control_update(self._scene_id, [control])
+
+        packet['params']['seq'] = self._seq
+        self._seq += 1
+        return packet
+
+    def _weighted_choice(self):
+        target = random.uniform(0, sum(self._weights))
+        for method_name, weight in zip(self._methods, self._weights):
+            target -= weight
+            if target <= 0:
+                return method_name
+        return self._methods[-1]
+
+
+class SyntheticSocket:
+    """
+    SyntheticSocket stands in for a websocket, feeding a Connection with
+    ``packets`` packets of synthetic traffic, in frames of ``batch``
+    packets, without any network involved::
+
+        socket = SyntheticSocket(SyntheticTraffic(participants=10000), 1000)
+        connection = Connection(socket=socket)
+
+    It starts with a ``hello`` and then behaves as though closed once all
+    packets have been delivered. The perf_counter() time at which each
+    packet was handed to the connection is kept in ``traffic.produced_at``
+    under its sequence number.
+    """
+
+    def __init__(self, traffic, packets, batch=1, codec=None, loop=None):
+        self.traffic = traffic
+        self._remaining = packets
+        self._batch = batch
+        self._codec = codec or default_codec()
+        self._loop = loop or asyncio.get_event_loop()
+        self._greeted = False
+        self.sent_frames = 0
+
+    async def recv(self):
+        await asyncio.sleep(0, loop=self._loop)
+        if not self._greeted:
+            self._greeted = True
+            return self._codec.dumps(method('hello', {}))
+
+        if self._remaining <= 0:
+            raise websockets.ConnectionClosed(1000, 'end of traffic')
+
+        count = min(self._batch, self._remaining)
+        self._remaining -= count
+        packets = [self.traffic.next_packet() for _ in range(count)]
+        now = time.perf_counter()
+        for packet in packets:
+            self.traffic.produced_at[packet['params']['seq']] = now
+
+        return self._codec.dumps(packets if count > 1 else packets[0])
+
+    async def send(self, data):
+        self.sent_frames += 1
+
+    async def close(self):
+        self._remaining = 0
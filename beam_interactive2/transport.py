@@ -0,0 +1,91 @@
+try:
+    from websockets.extensions.permessage_deflate import \
+        ClientPerMessageDeflateFactory, ServerPerMessageDeflateFactory
+except ImportError:
+    # websockets < 4 doesn't support extensions.
+    ClientPerMessageDeflateFactory = ServerPerMessageDeflateFactory = None
+
+
+class PerMessageDeflate:
+    """
+    PerMessageDeflate holds the settings for compressing at the websocket
+    layer with the permessage-deflate extension (RFC 7692), rather than
+    with an Encoding negotiated through ``setCompression``. Pass it to a
+    Connection as ``transport_compression``::
+
+        Connection(..., transport_compression=PerMessageDeflate(level=1))
+
+    ``level`` and ``mem_level`` tune our compressor. ``max_window_bits``
+    bounds the window we compress with, and ``server_max_window_bits`` asks
+    the server to bound its own, which saves memory at some cost in ratio.
+    With ``no_context_takeover``, each message is compressed on its own,
+    and ``server_no_context_takeover`` asks the same of the server.
+
+    Both sides have to support the extension; if the server doesn't,
+    messages are sent uncompressed. Requires websockets 4 or later.
+    """
+
+    def __init__(self, level=6, mem_level=8, max_window_bits=None,
+                 server_max_window_bits=None, no_context_takeover=False,
+                 server_no_context_takeover=False):
+        if ClientPerMessageDeflateFactory is None:
+            raise ImportError('permessage-deflate requires websockets 4')
+
+        self.level = level
+        self.mem_level = mem_level
+        self.max_window_bits = max_window_bits
+        self.server_max_window_bits = server_max_window_bits
+        self.no_context_takeover = no_context_takeover
+        self.server_no_context_takeover = server_no_context_takeover
+
+    def _compress_settings(self):
+        return {'level': self.level, 'memLevel': self.mem_level}
+
+    def client_extensions(self):
+        """
+        Returns the extensions to offer when connecting as a client.
+        :rtype: list
+        """
+        return [ClientPerMessageDeflateFactory(
+            server_no_context_takeover=self.server_no_context_takeover,
+            client_no_context_takeover=self.no_context_takeover,
+            server_max_window_bits=self.server_max_window_bits,
+            client_max_window_bits=self.max_window_bits,
+            compress_settings=self._compress_settings())]
+
+    def server_extensions(self):
+        """
+        Returns the extensions to accept when serving, as the stand-in
+        server does. From the server's side, the ``server_`` settings are
+        its own.
+        :rtype: list
+        """
+        return [ServerPerMessageDeflateFactory(
+            server_no_context_takeover=self.server_no_context_takeover,
+            client_no_context_takeover=self.no_context_takeover,
+            server_max_window_bits=self.server_max_window_bits,
+            client_max_window_bits=self.max_window_bits,
+            compress_settings=self._compress_settings())]
+
+
+def websocket_kwargs(transport_compression, server=False):
+    """
+    Returns the keyword arguments which configure permessage-deflate for
+    websockets' ``connect``, or ``serve`` if ``server`` is True.
+
+    :param transport_compression: A PerMessageDeflate, False to turn
+                                  compression off, or None for websockets'
+                                  default
+    :rtype: dict
+    """
+    if transport_compression is None:
+        return {}
+    if transport_compression is False:
+        # websockets < 4 has no ``compression`` argument, and never
+        # compresses anyway.
+        if ClientPerMessageDeflateFactory is None:
+            return {}
+        return {'compression': None}
+    if server:
+        return {'extensions': transport_compression.server_extensions()}
+    return {'extensions': transport_compression.client_extensions()}
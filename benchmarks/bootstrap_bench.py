@@ -0,0 +1,66 @@
+"""
+Compares time-to-ready against a local StandInServer which delays its
+replies to simulate network latency: the post-handshake calls made one
+after another, as bots did, against State.bootstrap sending them at once.
+The bootstrap's per-stage timings are printed for the last latency. Run it
+from the repository root::
+
+    PYTHONPATH=. python benchmarks/bootstrap_bench.py [participants]
+"""
+import asyncio
+import sys
+import time
+
+from beam_interactive2 import GzipEncoding, State
+from beam_interactive2.standin import StandInServer
+from beam_interactive2.traffic import participant
+
+
+async def serial(state):
+    await state._connection.set_compression(GzipEncoding())
+    await state.sync_time()
+    await state.get_scenes()
+    await state.get_groups()
+    await state.get_participants()
+    await state._connection.call('ready', {'isReady': True})
+
+
+async def parallel(state):
+    await state.bootstrap(compression=GzipEncoding(), ready=True)
+
+
+async def measure(loop, server, startup):
+    state = await State.connect(address=server.address, loop=loop)
+    start = time.perf_counter()
+    await startup(state)
+    elapsed = time.perf_counter() - start
+    await state._connection.close()
+    return elapsed, state.startup_timings
+
+
+async def run(loop, participants):
+    server = StandInServer(loop=loop)
+    await server.start()
+    for _ in range(participants):
+        p = participant()
+        server.participants[p['sessionID']] = p
+
+    print('{:<14} {:>12} {:>15}'.format('latency (ms)', 'serial (ms)',
+                                        'bootstrap (ms)'))
+    for latency in (0, 0.01, 0.05):
+        server.latency = latency
+        results = [await measure(loop, server, startup)
+                   for startup in (serial, parallel)]
+        print('{:<14.0f} {:>12.1f} {:>15.1f}'.format(
+            latency * 1e3, results[0][0] * 1e3, results[1][0] * 1e3))
+
+    print()
+    for name, seconds in results[1][1].items():
+        print('{:<20} {:>8.1f} ms'.format(name, seconds * 1e3))
+    await server.close()
+
+
+if __name__ == '__main__':
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(
+        run(loop, int(sys.argv[1]) if len(sys.argv) > 1 else 1000))
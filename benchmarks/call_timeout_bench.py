@@ -0,0 +1,52 @@
+"""
+Measures the per-call overhead of arming a reply timeout, comparing a
+separate asyncio.wait_for per call against the shared TimeoutWheel that
+Connection uses. Each call is resolved on the next loop iteration, the
+way a prompt reply from the server would be. Run it from the repository
+root::
+
+    PYTHONPATH=. python benchmarks/call_timeout_bench.py [calls]
+"""
+import asyncio
+import sys
+import time
+
+from beam_interactive2.timeouts import TimeoutWheel
+
+
+async def with_wait_for(loop):
+    future = loop.create_future()
+    loop.call_soon(future.set_result, None)
+    return await asyncio.wait_for(future, 10)
+
+
+async def with_wheel(loop, wheel):
+    future = loop.create_future()
+    wheel.add(future, 10)
+    loop.call_soon(future.set_result, None)
+    return await future
+
+
+def measure(loop, make_call, calls):
+    async def run():
+        await asyncio.gather(*[make_call() for _ in range(calls)])
+
+    start = time.perf_counter()
+    loop.run_until_complete(run())
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def main(calls):
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    wheel = TimeoutWheel(loop)
+    wait_for = measure(loop, lambda: with_wait_for(loop), calls)
+    wheeled = measure(loop, lambda: with_wheel(loop, wheel), calls)
+    print('calls: {}'.format(calls))
+    print('asyncio.wait_for: {:8.2f} us/call'.format(wait_for))
+    print('TimeoutWheel:     {:8.2f} us/call'.format(wheeled))
+    loop.close()
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,42 @@
+"""
+Compares the throughput of each available Codec on the sample payloads
+from the test fixtures. Run it from the repository root::
+
+    PYTHONPATH=. python benchmarks/codec_bench.py [iterations]
+"""
+import os
+import sys
+import timeit
+
+from beam_interactive2.codec import available_codecs
+
+fixture_path = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                            '..', 'tests', 'fixture')
+
+
+def load_samples():
+    samples = []
+    for name in sorted(os.listdir(fixture_path)):
+        if name.endswith('_decoded'):
+            with open(os.path.join(fixture_path, name)) as f:
+                samples.append(f.read().strip())
+    return samples
+
+
+def run(iterations):
+    samples = load_samples()
+    print('{:<8} {:>14} {:>14}'.format('codec', 'loads (us/op)',
+                                       'dumps (us/op)'))
+    for codec in available_codecs():
+        parsed = [codec.loads(s) for s in samples]
+        loads = timeit.timeit(lambda: [codec.loads(s) for s in samples],
+                              number=iterations)
+        dumps = timeit.timeit(lambda: [codec.dumps(p) for p in parsed],
+                              number=iterations)
+        ops = iterations * len(samples)
+        print('{:<8} {:>14.3f} {:>14.3f}'.format(
+            codec.name(), loads / ops * 1e6, dumps / ops * 1e6))
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,70 @@
+"""
+Compares DictionaryEncoding with GzipEncoding and TextEncoding on synthetic
+Interactive traffic: the bytes each puts on the wire and the CPU time it
+takes to encode and decode. "cold" measures the first message of a fresh
+stream, "stream" measures messages sent down one long-lived stream, as on
+a connection. Run it from the repository root::
+
+    PYTHONPATH=. python benchmarks/dictionary_bench.py \
+        [messages] [dictionary file]
+
+Without a dictionary file, the default dictionary is compared with one
+built from a separate sample of the same synthetic traffic.
+"""
+import random
+import sys
+import time
+
+from beam_interactive2.codec import JsonCodec
+from beam_interactive2.dictionary import build_dictionary
+from beam_interactive2.encoding import TextEncoding, GzipEncoding, \
+    DictionaryEncoding
+from beam_interactive2.traffic import SyntheticTraffic
+
+
+def sample_messages(n, seed):
+    random.seed(seed)
+    codec = JsonCodec()
+    traffic = SyntheticTraffic(participants=100)
+    return [codec.dumps(traffic.next_packet()) for _ in range(n)]
+
+
+def measure(name, factory, messages):
+    raw = sum(len(m.encode('utf-8')) for m in messages)
+    cold = sum(len(factory().encode(m)) for m in messages[:200])
+    cold_raw = sum(len(m.encode('utf-8')) for m in messages[:200])
+
+    encoder, decoder = factory(), factory()
+    start = time.perf_counter()
+    frames = [encoder.encode(m) for m in messages]
+    encoded = time.perf_counter() - start
+    start = time.perf_counter()
+    for frame in frames:
+        decoder.decode(frame)
+    decoded = time.perf_counter() - start
+    size = sum(len(f) for f in frames)
+
+    print('{:<14} {:>10.1%} {:>10.1%} {:>12.2f} {:>12.2f}'.format(
+        name, cold / cold_raw, size / raw,
+        encoded / len(messages) * 1e6, decoded / len(messages) * 1e6))
+
+
+def run(n, dictionary_path=None):
+    messages = sample_messages(n, seed=1)
+    if dictionary_path is not None:
+        with open(dictionary_path, 'rb') as f:
+            built = f.read()
+    else:
+        built = build_dictionary(sample_messages(5000, seed=2))
+
+    print('{:<14} {:>10} {:>10} {:>12} {:>12}'.format(
+        'encoding', 'cold size', 'stream', 'encode (us)', 'decode (us)'))
+    measure('text', TextEncoding, messages)
+    measure('gzip', GzipEncoding, messages)
+    measure('zdict', DictionaryEncoding, messages)
+    measure('zdict (built)', lambda: DictionaryEncoding(built), messages)
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20000,
+        sys.argv[2] if len(sys.argv) > 2 else None)
@@ -0,0 +1,113 @@
+"""
+Compares emitting through pyee's EventEmitter with the DispatchEmitter
+State uses, at 1, 5 and 20 synchronous listeners on an event, and with a
+single coroutine listener, which both schedule. Also times State.pump
+dispatching queued synthetic giveInput calls to 1, 5 and 20 listeners,
+through each of them. Run it from the repository root::
+
+    PYTHONPATH=. python benchmarks/dispatch_bench.py [emits]
+"""
+import asyncio
+import sys
+import time
+
+from pyee import EventEmitter
+
+try:
+    from pyee.asyncio import AsyncIOEventEmitter
+except ImportError:
+    try:
+        from pyee import AsyncIOEventEmitter
+    except ImportError:  # pyee < 8 schedules coroutines itself
+        AsyncIOEventEmitter = EventEmitter
+
+from beam_interactive2 import Connection, DispatchEmitter, State
+from beam_interactive2.traffic import SyntheticTraffic, SyntheticSocket
+
+
+def make_listener(counts):
+    def listener(call):
+        counts[0] += 1
+    return listener
+
+
+def time_emits(emitter, emits):
+    emit = emitter.emit
+    start = time.perf_counter()
+    for _ in range(emits):
+        emit('giveInput', None)
+    return (time.perf_counter() - start) / emits
+
+
+def time_coroutine_emits(cls, emits):
+    loop = asyncio.new_event_loop()
+    emitter = cls(loop=loop)
+
+    async def listener(call):
+        pass
+
+    emitter.on('giveInput', listener)
+    elapsed = time_emits(emitter, emits)
+    # Run the scheduled coroutines, so they aren't reported as never run.
+    loop.run_until_complete(asyncio.sleep(0, loop=loop))
+    loop.close()
+    return elapsed
+
+
+class PyeeState(State):
+    """State dispatching through pyee's emit, as it used to."""
+    emit = EventEmitter.emit
+
+
+async def time_pump(loop, cls, listeners, packets):
+    connection = Connection(socket=SyntheticSocket(
+        SyntheticTraffic(mix={'giveInput': 1.0}), packets, batch=64,
+        loop=loop), loop=loop)
+    await connection.connect()
+    state = cls(connection)
+    counts = [0]
+    for _ in range(listeners):
+        state.on('giveInput', make_listener(counts))
+
+    # Read all the traffic first, so that only dispatch is timed.
+    await connection._recv_task
+    start = time.perf_counter()
+    state.pump()
+    elapsed = time.perf_counter() - start
+    assert counts[0] == listeners * packets
+    return elapsed / packets
+
+
+def run(emits):
+    print('{:<22} {:>12} {:>12} {:>9}'.format(
+        'emit', 'pyee (us)', 'table (us)', 'speedup'))
+    for listeners in (1, 5, 20):
+        times = []
+        for cls in (EventEmitter, DispatchEmitter):
+            emitter, counts = cls(), [0]
+            for _ in range(listeners):
+                emitter.on('giveInput', make_listener(counts))
+            times.append(time_emits(emitter, emits))
+        print('{:<22} {:>12.3f} {:>12.3f} {:>8.1f}x'.format(
+            '{} sync listeners'.format(listeners), times[0] * 1e6,
+            times[1] * 1e6, times[0] / times[1]))
+
+    times = [time_coroutine_emits(cls, emits // 10)
+             for cls in (AsyncIOEventEmitter, DispatchEmitter)]
+    print('{:<22} {:>12.3f} {:>12.3f} {:>8.1f}x'.format(
+        '1 coroutine listener', times[0] * 1e6, times[1] * 1e6,
+        times[0] / times[1]))
+
+    print()
+    loop = asyncio.new_event_loop()
+    for listeners in (1, 5, 20):
+        times = [loop.run_until_complete(
+            time_pump(loop, cls, listeners, emits // 10))
+            for cls in (PyeeState, State)]
+        print('{:<22} {:>12.3f} {:>12.3f} {:>8.1f}x'.format(
+            'pump, {} listeners'.format(listeners), times[0] * 1e6,
+            times[1] * 1e6, times[0] / times[1]))
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
@@ -0,0 +1,125 @@
+"""
+Compares the throughput and peak memory of GzipEncoding against the
+GzipFile-based implementation it replaced, which is copied below. Both
+encode and then decode the sample payloads from the test fixtures. Run it
+from the repository root::
+
+    PYTHONPATH=. python benchmarks/encoding_bench.py [iterations]
+"""
+from gzip import GzipFile
+import io
+import os
+import sys
+import time
+import tracemalloc
+import zlib
+
+from beam_interactive2.encoding import Encoding, GzipEncoding, write_varint
+
+fixture_path = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                            '..', 'tests', 'fixture')
+
+
+def decode_varint_stream(stream):
+    # Stands in for varint.decode_stream, which the old class used.
+    value = shift = 0
+    while True:
+        byte = stream.read(1)[0]
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value
+        shift += 7
+
+
+def reset_buffer(buffer, value=None):
+    buffer.truncate(0)
+    buffer.seek(0)
+
+    if value is not None:
+        buffer.write(value)
+
+
+class GzipFileEncoding(Encoding):
+    def __init__(self, compression_level=6):
+        super()
+        self._encoder_buffer = io.BytesIO()
+        self._encoder = None
+        self._decoder_buffer = io.BytesIO()
+        self._decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        self._compression_level = compression_level
+
+    def name(self):
+        return 'gzip'
+
+    def encode(self, data):
+        data = data.encode('utf-8')
+        self._encoder_buffer.write(write_varint(len(data)))
+
+        if self._encoder is None:
+            self._encoder = GzipFile(fileobj=self._encoder_buffer, mode='wb',
+                                     compresslevel=self._compression_level)
+
+        self._encoder.write(data)
+        self._encoder.flush()
+
+        output = self._encoder_buffer.getvalue()
+        reset_buffer(self._encoder_buffer)
+
+        return output
+
+    def decode(self, data):
+        prefix_stream = io.BytesIO(data)
+        decoded_bytes = decode_varint_stream(prefix_stream)
+        self._decoder_buffer.write(data[prefix_stream.tell():])
+        self._decoder_buffer.seek(0)
+
+        decoded_data = self._decoder.decompress(
+            self._decoder_buffer.getbuffer(), decoded_bytes)
+        reset_buffer(self._decoder_buffer, self._decoder.unconsumed_tail)
+
+        return decoded_data.decode('utf-8')
+
+
+def load_samples():
+    samples = []
+    for name in sorted(os.listdir(fixture_path)):
+        if name.endswith('_decoded'):
+            with open(os.path.join(fixture_path, name)) as f:
+                samples.append(f.read().strip())
+    return samples
+
+
+def round_trips(cls, samples, iterations):
+    # One instance handles both directions, as it does on a Connection.
+    # Decoding our own output works since the two streams are separate.
+    encoding = cls()
+    for _ in range(iterations):
+        for sample in samples:
+            encoding.decode(encoding.encode(sample))
+
+
+def run(iterations):
+    samples = load_samples()
+    ops = iterations * len(samples)
+    print('{:<10} {:>16} {:>16}'.format(
+        'encoding', 'round trip (us)', 'peak (KiB)'))
+    for cls in (GzipFileEncoding, GzipEncoding):
+        # Check the implementations can read each other's streams.
+        assert GzipEncoding().decode(cls().encode(samples[0])) == samples[0]
+
+        start = time.perf_counter()
+        round_trips(cls, samples, iterations)
+        elapsed = time.perf_counter() - start
+
+        tracemalloc.start()
+        round_trips(cls, samples, iterations // 10 or 1)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        print('{:<10} {:>16.2f} {:>16.1f}'.format(
+            'gzipfile' if cls is GzipFileEncoding else 'zlib',
+            elapsed / ops * 1e6, peak / 1024))
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
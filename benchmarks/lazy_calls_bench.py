@@ -0,0 +1,77 @@
+"""
+Measures lazy call parsing and the unhandled-method filter on a traffic
+mix dominated by joystick moves. Each run reads synthetic traffic through
+a Connection and dispatches it with State.pump, and reports packets per
+second for:
+
+ - eager: every call parsed as it arrives (the default)
+ - lazy: Connection(lazy_calls=True), calls parsed when their data is used
+ - lazy+drop: lazy, plus State.drop_unhandled()
+
+both for a client which handles giveInput and reads its data, and for one
+which only follows participants (no giveInput listeners). Generating the
+synthetic traffic is included in the time. Run it from the repository
+root::
+
+    PYTHONPATH=. python benchmarks/lazy_calls_bench.py [packets]
+"""
+import asyncio
+import contextlib
+import os
+import sys
+import time
+
+from beam_interactive2 import Connection, State
+from beam_interactive2.traffic import SyntheticTraffic, SyntheticSocket
+
+mix = {
+    'giveInput': 0.95,
+    'onParticipantUpdate': 0.02,
+    'onParticipantJoin': 0.015,
+    'onParticipantLeave': 0.015,
+}
+
+
+async def measure(loop, packets, lazy, drop, handle_input):
+    traffic = SyntheticTraffic(participants=1000, mix=mix,
+                               joystick_share=0.9)
+    connection = Connection(socket=SyntheticSocket(traffic, packets,
+                                                   loop=loop),
+                            loop=loop, lazy_calls=lazy)
+    await connection.connect()
+    state = State(connection)
+    for session_id, p in traffic.population.items():
+        state.participants[session_id] = {k: v for k, v in p.items()
+                                          if k != 'sessionID'}
+
+    moves = []
+    if handle_input:
+        state.on('giveInput', lambda call: moves.append(
+            call.data['input'].get('x')))
+    if drop:
+        state.drop_unhandled()
+
+    start = time.perf_counter()
+    await connection._recv_task
+    state.pump()
+    return packets / (time.perf_counter() - start)
+
+
+def main(packets):
+    loop = asyncio.get_event_loop()
+    print('{:<16} {:>12} {:>12} {:>12}'.format(
+        'client', 'eager pkt/s', 'lazy pkt/s', 'lazy+drop'))
+    for name, handle_input in [('handles input', True),
+                               ('participants', False)]:
+        results = []
+        with open(os.devnull, 'w') as devnull, \
+                contextlib.redirect_stdout(devnull):
+            for lazy, drop in [(False, False), (True, False), (True, True)]:
+                results.append(loop.run_until_complete(
+                    measure(loop, packets, lazy, drop, handle_input)))
+
+        print('{:<16} {:>12.0f} {:>12.0f} {:>12.0f}'.format(name, *results))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50000)
@@ -0,0 +1,86 @@
+"""
+Compares the typed Message classes with dict-based Calls on synthetic
+traffic: the memory held by a queue of received calls, and the time to
+parse a frame, wrap it, and read an input's control and position in a
+handler. Run it from the repository root::
+
+    PYTHONPATH=. python benchmarks/messages_bench.py [calls]
+"""
+import random
+import sys
+import time
+import tracemalloc
+
+from beam_interactive2 import JoystickInput
+from beam_interactive2.codec import JsonCodec
+from beam_interactive2.messages import Call, Input, decode_message
+from beam_interactive2.traffic import SyntheticTraffic
+
+
+class Holder:
+    """Stands in for the connection a Call refers to."""
+    _codec = JsonCodec()
+
+
+def frames(n):
+    random.seed(1)
+    traffic = SyntheticTraffic(participants=1000, joystick_share=0.9)
+    codec = JsonCodec()
+    return [codec.dumps(traffic.next_packet()) for _ in range(n)]
+
+
+def wrap_dict(connection, packet):
+    return Call(connection, packet)
+
+
+def handle_dict(call):
+    if call.name == 'giveInput':
+        given = call.data['input']
+        return given['controlID'], given.get('x'), given.get('y')
+
+
+def handle_typed(call):
+    if isinstance(call, JoystickInput):
+        return call.control_id, call.x, call.y
+    if isinstance(call, Input):
+        return call.control_id, None, None
+
+
+def typed(connection, packet):
+    return decode_message(connection, packet) or Call(connection, packet)
+
+
+def retained(wrap, connection, parsed):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    calls = [wrap(connection, packet()) for packet in parsed]
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del calls
+    return size
+
+
+def run(n):
+    data = frames(n)
+    connection = Holder()
+    codec = connection._codec
+    print('{:<8} {:>16} {:>20}'.format('calls', 'bytes per call',
+                                       'parse+handle (us)'))
+    for name, wrap, handle in [('dict', wrap_dict, handle_dict),
+                               ('typed', typed, handle_typed)]:
+        # Parse inside the measurement, so that the dicts a typed message
+        # drops are freed rather than counted.
+        size = retained(wrap, connection,
+                        [lambda f=f: codec.loads(f) for f in data])
+
+        start = time.perf_counter()
+        for frame in data:
+            handle(wrap(connection, codec.loads(frame)))
+        elapsed = time.perf_counter() - start
+
+        print('{:<8} {:>16.0f} {:>20.2f}'.format(
+            name, size / n, elapsed / n * 1e6))
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 50000)
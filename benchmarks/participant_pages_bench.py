@@ -0,0 +1,90 @@
+"""
+Measures warming up a State on a large audience from a local StandInServer:
+one getAllParticipants call for everyone, against paging through it with
+State.participant_pages. Reports the time until every participant is
+known, the longest the event loop went without running other tasks, and
+the peak memory traced while loading. Beyond
+about 4000 participants, the single reply is larger than websockets'
+default 1MB frame limit and drops the connection, so only paging is run.
+Run it from the repository root::
+
+    PYTHONPATH=. python benchmarks/participant_pages_bench.py \
+        [participants] [page_size]
+"""
+import asyncio
+import sys
+import time
+import tracemalloc
+
+from beam_interactive2 import State
+from beam_interactive2.standin import StandInServer
+from beam_interactive2.traffic import participant
+
+
+async def watch_loop(loop, stalls):
+    """Records the longest gap between this task's turns on the loop."""
+    last = time.perf_counter()
+    while True:
+        await asyncio.sleep(0, loop=loop)
+        now = time.perf_counter()
+        stalls[0] = max(stalls[0], now - last)
+        last = now
+
+
+async def single(state):
+    def store(participant):
+        state.participants[participant.pop('sessionID')] = participant
+
+    await state._connection.call('getAllParticipants', {'from': 0},
+                                 sinks={'participants': store})
+
+
+async def paged(state):
+    async for _ in state.participant_pages():
+        pass
+
+
+async def measure(loop, server, load):
+    state = await State.connect(address=server.address, loop=loop)
+    stalls = [0]
+    watcher = asyncio.ensure_future(watch_loop(loop, stalls), loop=loop)
+    await asyncio.sleep(0, loop=loop)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    await load(state)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    watcher.cancel()
+    await state._connection.close()
+    return len(state.participants), elapsed, stalls[0], peak
+
+
+async def run(loop, count, page_size):
+    server = StandInServer(page_size=page_size, loop=loop)
+    await server.start()
+    for i in range(count):
+        p = participant()
+        p['connectedAt'] = 1500000000000 + i
+        server.participants[p['sessionID']] = p
+
+    print('{:<8} {:>8} {:>10} {:>16} {:>10}'.format(
+        'mode', 'loaded', 'time (ms)', 'max stall (ms)', 'peak (MB)'))
+    for name, load in [('single', single), ('paged', paged)]:
+        if load is single and count > 4000:
+            print('{:<8} {:>8}'.format(name, 'too large'))
+            continue
+        server.page_size = None if load is single else page_size
+        loaded, elapsed, stall, peak = await measure(loop, server, load)
+        print('{:<8} {:>8} {:>10.0f} {:>16.1f} {:>10.1f}'.format(
+            name, loaded, elapsed * 1e3, stall * 1e3, peak / 1e6))
+    await server.close()
+
+
+if __name__ == '__main__':
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(run(
+        loop, int(sys.argv[1]) if len(sys.argv) > 1 else 50000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 1000))
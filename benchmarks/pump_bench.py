@@ -0,0 +1,104 @@
+"""
+Pushes synthetic traffic through Connection and State with no sockets
+involved, and reports where time goes as the simulated audience grows.
+For each audience size it measures:
+
+ - ingest: reading, parsing and queueing packets in Connection._handle_recv
+ - pump: dispatching the queued packets with State.pump and
+   EventEmitter.emit
+ - pump_async: both together as packets arrive, with the per-packet latency
+   from being handed to the connection to reaching a handler
+
+Run it from the repository root::
+
+    PYTHONPATH=. python benchmarks/pump_bench.py [packets] [participants...]
+"""
+import asyncio
+import contextlib
+import os
+import sys
+import time
+
+from beam_interactive2 import Connection, State
+from beam_interactive2.traffic import SyntheticTraffic, SyntheticSocket, \
+    default_mix
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+async def make_state(loop, traffic, packets):
+    connection = Connection(socket=SyntheticSocket(traffic, packets,
+                                                   loop=loop), loop=loop)
+    await connection.connect()
+    state = State(connection)
+    for session_id, p in traffic.population.items():
+        state.participants[session_id] = {k: v for k, v in p.items()
+                                          if k != 'sessionID'}
+
+    latencies = []
+
+    def on_call(call):
+        produced_at = traffic.produced_at.pop(call.data['seq'], None)
+        if produced_at is not None:
+            latencies.append(time.perf_counter() - produced_at)
+
+    for name in default_mix:
+        state.on(name, on_call)
+
+    return connection, state, latencies
+
+
+async def run_sync(loop, participants, packets):
+    connection, state, _ = await make_state(
+        loop, SyntheticTraffic(participants), packets)
+
+    start = time.perf_counter()
+    await connection._recv_task
+    ingest = time.perf_counter() - start
+
+    start = time.perf_counter()
+    state.pump()
+    pump = time.perf_counter() - start
+
+    return ingest, pump
+
+
+async def run_async(loop, participants, packets):
+    connection, state, latencies = await make_state(
+        loop, SyntheticTraffic(participants), packets)
+
+    start = time.perf_counter()
+    await state.pump_async(loop=loop)
+    elapsed = time.perf_counter() - start
+
+    return elapsed, latencies
+
+
+def main(packets, audiences):
+    loop = asyncio.get_event_loop()
+    print('{:>12} {:>14} {:>14} {:>14} {:>10} {:>10}'.format(
+        'participants', 'ingest pkt/s', 'pump pkt/s', 'async pkt/s',
+        'p50 ms', 'p99 ms'))
+
+    for participants in audiences:
+        # State prints a line for each join and leave, which we don't
+        # want to measure the terminal for.
+        with open(os.devnull, 'w') as devnull, \
+                contextlib.redirect_stdout(devnull):
+            ingest, pump = loop.run_until_complete(
+                run_sync(loop, participants, packets))
+            elapsed, latencies = loop.run_until_complete(
+                run_async(loop, participants, packets))
+
+        print('{:>12} {:>14.0f} {:>14.0f} {:>14.0f} {:>10.3f} {:>10.3f}'
+              .format(participants, packets / ingest, packets / pump,
+                      packets / elapsed, percentile(latencies, 0.5) * 1000,
+                      percentile(latencies, 0.99) * 1000))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000,
+         [int(a) for a in sys.argv[2:]] or [1000, 10000, 100000])
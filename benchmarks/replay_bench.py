@@ -0,0 +1,45 @@
+"""
+Replays a recorded session through a Connection and State, and reports
+how quickly State.pump works through the recorded traffic. Record a
+session by assigning a Recorder to a live connection, then run::
+
+    PYTHONPATH=. python benchmarks/replay_bench.py session.rec [speed]
+
+Leave out the speed to replay as fast as possible.
+"""
+import asyncio
+import sys
+import time
+
+from beam_interactive2 import Connection, ReplaySocket, State
+
+
+def main(path, speed):
+    loop = asyncio.get_event_loop()
+    connection = Connection(socket=ReplaySocket(path, speed=speed, loop=loop),
+                            loop=loop)
+    loop.run_until_complete(connection.connect())
+    state = State(connection)
+    handled = [0]
+
+    def count(call):
+        handled[0] += 1
+
+    for method in ('giveInput', 'onParticipantJoin', 'onParticipantLeave',
+                   'onParticipantUpdate', 'onControlUpdate'):
+        state.on(method, count)
+
+    async def run():
+        state.pump()  # anything read while connecting
+        while await connection.has_packet():
+            state.pump()
+
+    start = time.perf_counter()
+    loop.run_until_complete(run())
+    elapsed = time.perf_counter() - start
+    print('{} packets handled in {:.3f}s ({:.0f} packets/s)'.format(
+        handled[0], elapsed, handled[0] / elapsed))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1], float(sys.argv[2]) if len(sys.argv) > 2 else None)
@@ -0,0 +1,59 @@
+"""
+Runs a State client against a local StandInServer driving a swarm of
+participants, and reports end-to-end input throughput and latency. Run it
+from the repository root::
+
+    PYTHONPATH=. python benchmarks/standin_load.py \
+        [participants] [inputs/s] [moves/s]
+"""
+import asyncio
+import sys
+
+from beam_interactive2 import GzipEncoding, State
+from beam_interactive2.standin import StandInServer
+
+
+def percentile(values, p):
+    if len(values) == 0:
+        return 0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+async def run(loop, participants, input_rate, move_rate, duration=5):
+    server = StandInServer(loop=loop)
+    await server.start()
+    state = await State.connect(address=server.address, loop=loop)
+    await state._connection.set_compression(GzipEncoding())
+
+    swarm = server.swarm(size=participants, join_rate=participants,
+                         input_rate=input_rate, move_rate=move_rate)
+    latencies = []
+    received = {'giveInput': 0}
+
+    def on_input(call):
+        received['giveInput'] += 1
+        sent_at = swarm.sent_at.pop(call.data.get('transactionID'), None)
+        if sent_at is not None:
+            latencies.append(loop.time() - sent_at)
+
+    state.on('giveInput', on_input)
+    state.pump_async(loop=loop)
+
+    await swarm.run(duration)
+    await asyncio.sleep(0.5, loop=loop)
+    await state._connection.close()
+    await server.close()
+
+    print('participants: {}, sent {} inputs and {} moves in {}s'.format(
+        participants, swarm.stats['input'], swarm.stats['move'], duration))
+    print('received {} giveInput ({:.0f}/s)'.format(
+        received['giveInput'], received['giveInput'] / duration))
+    print('button latency: p50 {:.2f}ms, p99 {:.2f}ms'.format(
+        percentile(latencies, 0.5) * 1000, percentile(latencies, 0.99) * 1000))
+
+
+if __name__ == '__main__':
+    args = [int(a) for a in sys.argv[1:]] + [1000, 500, 500][len(sys.argv) - 1:]
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(run(loop, *args[:3]))
@@ -0,0 +1,78 @@
+"""
+Measures State.get_participants on a gzip-compressed getAllParticipants
+reply, parsed whole and streamed with ``Connection(stream_threshold=...)``.
+For each it reports the time taken, the memory still held afterwards (the
+participants themselves), and the peak above that while the reply was
+being read. Run it from the repository root::
+
+    PYTHONPATH=. python benchmarks/streaming_bench.py [participants]
+"""
+import asyncio
+import json
+import sys
+import time
+import tracemalloc
+
+from beam_interactive2 import Connection, GzipEncoding, State
+from beam_interactive2.traffic import participant
+
+
+class ReplySocket:
+    """Answers every call with the same pre-encoded reply frame."""
+
+    def __init__(self, frame, loop):
+        self.frame = frame
+        self._replies = asyncio.Queue(loop=loop)
+        self._replies.put_nowait('{"type":"method","method":"hello"}')
+
+    async def send(self, frame):
+        self._replies.put_nowait(self.frame)
+
+    async def recv(self):
+        return await self._replies.get()
+
+    async def close(self):
+        pass
+
+
+def reply_frame(count):
+    text = json.dumps({'type': 'reply', 'id': 0, 'result': {
+        'participants': [participant() for _ in range(count)],
+        'total': count, 'hasMore': False}})
+    return len(text), GzipEncoding().encode(text)
+
+
+async def measure(loop, frame, threshold):
+    connection = Connection(socket=ReplySocket(frame, loop), loop=loop,
+                            stream_threshold=threshold)
+    await connection.connect()
+    connection._encoding = GzipEncoding()
+    state = State(connection)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    await state.get_participants()
+    elapsed = time.perf_counter() - start
+    held, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    connection._recv_task.cancel()
+    return elapsed, held, peak
+
+
+def run(count):
+    loop = asyncio.new_event_loop()
+    size, frame = reply_frame(count)
+    print('{} participants: {:.1f} MB of JSON, {:.1f} MB compressed'.format(
+        count, size / 1e6, len(frame) / 1e6))
+    print('{:<10} {:>10} {:>12} {:>16}'.format('mode', 'time (ms)',
+                                               'held (MB)', 'peak above (MB)'))
+    for name, threshold in [('whole', None), ('streamed', 0)]:
+        elapsed, held, peak = loop.run_until_complete(
+            measure(loop, frame, threshold))
+        print('{:<10} {:>10.1f} {:>12.1f} {:>16.1f}'.format(
+            name, elapsed * 1e3, held / 1e6, (peak - held) / 1e6))
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 50000)
@@ -0,0 +1,50 @@
+"""
+Compares serializing the packets we send most often through the packet
+templates against the codec alone. Only capture calls have a template;
+the others show what falling back to the codec costs, which is paid for
+every packet sent with ``Connection(packet_templates=True)``. Run it from
+the repository root::
+
+    PYTHONPATH=. python benchmarks/templates_bench.py [iterations]
+"""
+import sys
+import timeit
+
+from beam_interactive2.codec import available_codecs
+from beam_interactive2.templates import PacketTemplates
+
+
+def sample_packets():
+    controls = [{'controlID': 'button{}'.format(i), 'cooldown': 1500000000000,
+                 'etag': '252185589'} for i in range(3)]
+    return {
+        'capture': {'type': 'method', 'id': 1234, 'method': 'capture',
+                    'params': {'transactionID': '0b7a4e2c-1f3d-4c6f-9c1a'},
+                    'discard': False},
+        'updateControls': {'type': 'method', 'id': 1235,
+                           'method': 'updateControls',
+                           'params': {'sceneID': 'default',
+                                      'controls': controls},
+                           'discard': False},
+        'reply': {'type': 'reply', 'id': 1236, 'result': {'ok': True}},
+    }
+
+
+def run(iterations):
+    print('{:<8} {:<16} {:>14} {:>14}'.format(
+        'codec', 'packet', 'codec (us/op)', 'template (us/op)'))
+    for codec in available_codecs():
+        templates = PacketTemplates(codec)
+        for name, packet in sample_packets().items():
+            assert codec.dumps(packet) == templates.dumps(packet)
+            generic = timeit.timeit(lambda: codec.dumps(packet),
+                                    number=iterations)
+            templated = timeit.timeit(lambda: templates.dumps(packet),
+                                      number=iterations)
+            print('{:<8} {:<16} {:>14.3f} {:>14.3f}'.format(
+                codec.name(), name, generic / iterations * 1e6,
+                templated / iterations * 1e6))
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
@@ -0,0 +1,91 @@
+"""
+Compares plain text, app-level gzip (setCompression) and websocket
+permessage-deflate between a Connection and a local StandInServer. For
+each mode it makes sequential getScenes and capture calls and reports the
+round trip latency, the process CPU time per call (client and server
+together, since both run here) and the bytes on the wire. Run it from the
+repository root::
+
+    PYTHONPATH=. python benchmarks/transport_bench.py [calls]
+"""
+import asyncio
+import sys
+import time
+
+from beam_interactive2 import Connection, GzipEncoding, PerMessageDeflate
+from beam_interactive2.standin import StandInServer
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def count_bytes(socket):
+    """
+    Counts the bytes written and read on a connected websocket's transport,
+    after any TLS or websocket handshake.
+    """
+    counts = {'sent': 0, 'received': 0}
+    transport = getattr(socket, 'transport', None)
+    if transport is None:  # websockets < 8
+        transport = socket.writer.transport
+    write, data_received = transport.write, socket.data_received
+
+    def counting_write(data):
+        counts['sent'] += len(data)
+        write(data)
+
+    def counting_data_received(data):
+        counts['received'] += len(data)
+        data_received(data)
+
+    transport.write = counting_write
+    socket.data_received = counting_data_received
+    return counts
+
+
+async def measure(loop, name, calls, transport_compression, encoding=None):
+    server = StandInServer(transport_compression=transport_compression,
+                           loop=loop)
+    await server.start()
+    connection = Connection(address=server.address, loop=loop,
+                            transport_compression=transport_compression)
+    await connection.connect()
+    if encoding is not None:
+        await connection.set_compression(encoding)
+
+    counts = count_bytes(connection._socket)
+    latencies = []
+    cpu = time.process_time()
+    for i in range(calls):
+        method, params = ('getScenes', {}) if i % 2 == 0 else \
+            ('capture', {'transactionID': str(i)})
+        start = loop.time()
+        await connection.call(method, params)
+        latencies.append(loop.time() - start)
+    cpu = time.process_time() - cpu
+
+    print('{:<10} {:>10.1f} {:>10.1f} {:>10.1f} {:>12.0f} {:>12.0f}'.format(
+        name, percentile(latencies, 0.5) * 1e6,
+        percentile(latencies, 0.99) * 1e6, cpu / calls * 1e6,
+        counts['sent'] / calls, counts['received'] / calls))
+
+    await connection.close()
+    await server.close()
+
+
+async def run(loop, calls):
+    print('{:<10} {:>10} {:>10} {:>10} {:>12} {:>12}'.format(
+        'mode', 'p50 (us)', 'p99 (us)', 'cpu (us)', 'sent (B)',
+        'received (B)'))
+    await measure(loop, 'text', calls, False)
+    await measure(loop, 'gzip', calls, False, GzipEncoding())
+    await measure(loop, 'deflate', calls, PerMessageDeflate())
+    await measure(loop, 'deflate-1', calls, PerMessageDeflate(level=1))
+
+
+if __name__ == '__main__':
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(
+        run(loop, int(sys.argv[1]) if len(sys.argv) > 1 else 2000))
@@ -0,0 +1,108 @@
+import asyncio
+import collections
+
+from beam_interactive2 import AdaptiveCompression, GzipEncoding, \
+    TextEncoding
+from beam_interactive2.adaptive import Sample
+from beam_interactive2.capture import SEND, RECV
+from ._util import AsyncTestCase, async_test
+
+frame = '{"type":"method","method":"giveInput","params":{"participantID":' \
+        '"abc","input":{"controlID":"fire","event":"mousedown"}}}'
+
+
+class FakeConnection:
+    def __init__(self, loop):
+        self._loop = loop
+        self._encoding = TextEncoding()
+        self.stats = collections.Counter()
+        self.accept = True
+
+    async def set_compression(self, scheme):
+        if self.accept:
+            self._encoding = scheme
+        return self.accept
+
+
+class TestAdaptiveCompression(AsyncTestCase):
+
+    def setUp(self):
+        super(TestAdaptiveCompression, self).setUp()
+        self._connection = FakeConnection(self._loop)
+
+    def _policy(self, **kwargs):
+        # The test traffic is one burst, so almost any CPU time is a large
+        # share of the loop.
+        kwargs.setdefault('max_cpu_share', float('inf'))
+        policy = AdaptiveCompression(window=16, patience=2, trial_every=2,
+                                     **kwargs)
+        policy.attach(self._connection)
+        return policy
+
+    async def _traffic(self, policy, frames):
+        peer = GzipEncoding()
+        for i in range(frames):
+            encoding = self._connection._encoding
+            if i % 2 == 0:
+                policy.observe(SEND, frame, encoding.encode(frame), 0)
+            else:
+                wire = frame if isinstance(encoding, TextEncoding) else \
+                    peer.encode(frame)
+                policy.observe(RECV, frame, wire, 0)
+            await asyncio.sleep(0, loop=self._loop)
+
+    @async_test
+    def test_switches_to_compression_when_it_saves(self):
+        policy = self._policy()
+        switches = []
+        policy.add_switch_handler(switches.append)
+
+        yield from self._traffic(policy, 16)
+        self.assertEqual('text', self._connection._encoding.name())
+        yield from self._traffic(policy, 16)
+        self.assertEqual('gzip', self._connection._encoding.name())
+
+        self.assertEqual(1, self._connection.stats['compression_switches'])
+        self.assertEqual(switches, policy.switches)
+        _, current, target, reason = switches[0]
+        self.assertEqual(('text', 'gzip'), (current, target))
+        self.assertIn('gzip saves', reason)
+
+    @async_test
+    def test_switches_back_when_over_budget(self):
+        policy = self._policy()
+        yield from self._traffic(policy, 32)
+        self.assertEqual('gzip', self._connection._encoding.name())
+
+        # Spend a second on one frame of each window.
+        policy.max_cpu_share = 0
+        policy.observe(SEND, frame, b'x', 1)
+        yield from self._traffic(policy, 15)
+        policy.observe(SEND, frame, b'x', 1)
+        yield from self._traffic(policy, 15)
+        self.assertEqual('text', self._connection._encoding.name())
+        self.assertIn('the limits are', policy.switches[-1][3])
+
+    @async_test
+    def test_does_not_retry_refused_schemes(self):
+        self._connection.accept = False
+        policy = self._policy()
+        yield from self._traffic(policy, 64)
+        self.assertEqual('text', self._connection._encoding.name())
+        self.assertEqual([], policy.switches)
+        self.assertEqual({'gzip'}, policy._refused)
+
+    def test_hysteresis(self):
+        policy = self._policy(min_saving=0.5, hysteresis=0.1)
+        sample = Sample()
+        sample.add(100, 45, 0)
+        # Saving 55% is enough to stay on gzip, but not to switch to it.
+        self.assertTrue(policy._acceptable((sample.ratio, 0), 0))
+        self.assertFalse(policy._acceptable((sample.ratio, 0), 0.1))
+
+        policy._samples = {'text': Sample(), 'gzip': sample}
+        policy._samples['text'].add(100, 100, 0)
+        policy._text_bytes = 100
+        policy._evaluate('text')
+        policy._evaluate('text')
+        self.assertIsNone(policy._pending)
@@ -0,0 +1,20 @@
+import unittest
+from beam_interactive2 import available_codecs, default_codec, JsonCodec
+from ._util import fixture
+
+samples = 3
+
+
+class TestCodecs(unittest.TestCase):
+    def test_round_trip(self):
+        for codec in available_codecs():
+            for i in range(samples):
+                sample = JsonCodec().loads(
+                    fixture('sample{}_decoded'.format(i)))
+                encoded = codec.dumps(sample)
+                self.assertIsInstance(encoded, str)
+                self.assertEqual(sample, codec.loads(encoded))
+
+    def test_falls_back_to_stdlib(self):
+        self.assertEqual('json', available_codecs()[-1].name())
+        self.assertIs(type(default_codec()), type(available_codecs()[0]))
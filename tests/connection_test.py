@@ -1,8 +1,10 @@
 from unittest.mock import Mock
 import asyncio
+import json
 import websockets
 
-from beam_interactive2 import Connection, GzipEncoding
+from beam_interactive2 import Connection, GzipEncoding, PacketCapture, \
+    JoystickInput
 from ._util import AsyncTestCase, async_test, resolve, fixture
 
 
@@ -17,6 +19,7 @@ class TestInteractiveConnection(AsyncTestCase):
         self._mock_socket = Mock()
         self._mock_socket.close = asyncio.Future(loop=self._loop)
         self._mock_socket.close.set_result(None)
+        self._mock_socket.send.return_value = self._mock_socket.close
         self._queue = asyncio.Queue(loop=self._loop)
         self._connection = Connection(socket=self._mock_socket, loop=self._loop)
         self._mock_socket.recv = self._queue.get
@@ -27,15 +30,16 @@ class TestInteractiveConnection(AsyncTestCase):
             self._connection._recv_task.cancel()
         super(TestInteractiveConnection, self).tearDown()
 
-    async def _upgrade_to_gzip(self):
+    async def _upgrade_to_gzip(self, connection=None):
+        connection = connection or self._connection
         result = await asyncio.gather(
-            self._connection.set_compression(GzipEncoding()),
+            connection.set_compression(GzipEncoding()),
             self._queue.put(
                 '{"id":0,"type":"reply","result":{"scheme":"gzip"}}'),
             loop=self._loop)
 
         self.assertTrue(result[0])
-        self.assertEqual('gzip', self._connection._encoding.name())
+        self.assertEqual('gzip', connection._encoding.name())
 
     @async_test
     def test_sends_method_calls(self):
@@ -50,6 +54,355 @@ class TestInteractiveConnection(AsyncTestCase):
             self._mock_socket.send.call_args[0][0],
             {'type': 'method', 'method': 'square', 'params': 2, 'id': 0})
 
+    @async_test
+    def test_batches_packets_sent_in_the_same_tick(self):
+        connection = Connection(socket=self._mock_socket, loop=self._loop,
+                                batch_window=0)
+        yield from connection.connect()
+        yield from asyncio.gather(
+            connection.call('foo', 1, discard=True),
+            connection.call('bar', 2, discard=True),
+            loop=self._loop)
+        connection._recv_task.cancel()
+
+        self.assertEqual(1, self._mock_socket.send.call_count)
+        frame = json.loads(self._mock_socket.send.call_args[0][0])
+        self.assertEqual(['bar', 'foo'], sorted(p['method'] for p in frame))
+        self.assertEqual(1, connection.stats['frames_sent'])
+        self.assertEqual(2, connection.stats['packets_sent'])
+
+    @async_test
+    def test_limits_calls_in_flight(self):
+        connection = Connection(socket=self._mock_socket, loop=self._loop,
+                                max_in_flight=1)
+        yield from connection.connect()
+        first = asyncio.ensure_future(connection.call('square', 2),
+                                      loop=self._loop)
+        second = asyncio.ensure_future(connection.call('square', 3),
+                                       loop=self._loop)
+        yield from asyncio.sleep(0, loop=self._loop)
+
+        self.assertEqual(1, connection.in_flight)
+        self.assertEqual(1, self._mock_socket.send.call_count)
+
+        yield from self._queue.put('{"id":0,"type":"reply","result":4}')
+        self.assertEqual(4, (yield from first))
+        yield from self._queue.put('{"id":1,"type":"reply","result":9}')
+        self.assertEqual(9, (yield from second))
+        connection._recv_task.cancel()
+
+        self.assertEqual(2, self._mock_socket.send.call_count)
+        self.assertEqual(0, connection.in_flight)
+        self.assertEqual(1, connection.stats['call_window_waits'])
+
+    @async_test
+    def test_captures_recent_frames(self):
+        yield from self._connection.connect()
+        self._connection.capture = PacketCapture(size=2)
+        params = {'foo': 42}
+        yield from self._connection.call('foo', params, discard=True)
+        yield from asyncio.gather(
+            self._connection.call('square', 2),
+            self._queue.put('{"id":1,"type":"reply","result":4}'),
+            loop=self._loop)
+
+        frames = self._connection.capture.dump()
+        self.assertEqual(2, len(frames))
+        self.assertEqual(['SEND', 'RCV'], [f[1] for f in frames])
+        self.assertIn('square', frames[0][2])
+        self.assertEqual({'foo': 42}, params)
+
+    @async_test
+    def test_drains_buffered_frames_before_waking(self):
+        self._mock_socket.messages = self._queue
+        connection = Connection(socket=self._mock_socket, loop=self._loop,
+                                drain_recv=True)
+        for _ in range(3):
+            self._queue.put_nowait(sample_method)
+        yield from connection.connect()
+
+        has_packet = yield from connection.has_packet()
+        connection._recv_task.cancel()
+
+        self.assertTrue(has_packet)
+        self.assertEqual(3, len(connection.get_packets(5)))
+        self.assertEqual([], connection.get_packets())
+        self.assertEqual(1, connection.stats['recv_batches'])
+        self.assertEqual(3, connection.recv_batch_size)
+
+    @async_test
+    def test_drains_queued_packets_in_small_batches(self):
+        yield from self._connection.connect()
+        for _ in range(3):
+            self._queue.put_nowait(sample_method)
+        while len(self._connection._recv_queue) < 3:
+            yield from asyncio.sleep(0, loop=self._loop)
+
+        calls = []
+        while (yield from self._connection.has_packet()):
+            calls.extend(self._connection.get_packets(1))
+            if len(calls) == 3:
+                break
+        self.assertEqual(['some_method'] * 3, [c.name for c in calls])
+
+    @async_test
+    def test_offloads_large_frames_in_order(self):
+        connection = Connection(socket=self._mock_socket, loop=self._loop,
+                                offload_threshold=200)
+        yield from connection.connect()
+        connection._encoding = GzipEncoding()
+
+        server = GzipEncoding()
+        big = {'id': 0, 'type': 'method', 'method': 'onParticipantJoin',
+               'params': {'participants': [{'sessionID': str(i * 7919)}
+                                           for i in range(50)]}}
+        for packet in [json.loads(sample_method), big,
+                       json.loads(sample_method)]:
+            self._queue.put_nowait(server.encode(json.dumps(packet)))
+
+        names = []
+        for _ in range(3):
+            yield from connection.has_packet()
+            names.append(connection.get_packet().name)
+        connection._recv_task.cancel()
+
+        self.assertEqual(['some_method', 'onParticipantJoin', 'some_method'],
+                         names)
+        self.assertEqual(1, connection.stats['frames_offloaded'])
+
+    @async_test
+    def test_streams_large_replies_to_sinks(self):
+        connection = Connection(socket=self._mock_socket, loop=self._loop,
+                                stream_threshold=200)
+        yield from connection.connect()
+        yield from self._upgrade_to_gzip(connection)
+
+        server = GzipEncoding()
+        scenes = []
+        for call_id, count in ((1, 50), (2, 2)):
+            call = asyncio.ensure_future(
+                connection.call('getScenes', sinks={'scenes': scenes.append}),
+                loop=self._loop)
+            yield from asyncio.sleep(0, loop=self._loop)
+            self._queue.put_nowait(server.encode(json.dumps(
+                {'type': 'reply', 'id': call_id, 'result': {
+                    'scenes': [{'sceneID': str(i * 7919)}
+                               for i in range(count)]}})))
+            self.assertEqual({'scenes': []}, (yield from call))
+
+        connection._recv_task.cancel()
+        self.assertEqual(52, len(scenes))
+        self.assertEqual(1, connection.stats['frames_streamed'])
+
+    @async_test
+    def test_fails_the_call_when_a_sink_raises(self):
+        connection = Connection(socket=self._mock_socket, loop=self._loop,
+                                stream_threshold=200)
+        yield from connection.connect()
+        yield from self._upgrade_to_gzip(connection)
+
+        def sink(scene):
+            raise KeyError(scene['sceneID'])
+
+        server = GzipEncoding()
+        for call_id, count in ((1, 50), (2, 2)):
+            call = asyncio.ensure_future(
+                connection.call('getScenes', sinks={'scenes': sink}),
+                loop=self._loop)
+            yield from asyncio.sleep(0, loop=self._loop)
+            self._queue.put_nowait(server.encode(json.dumps(
+                {'type': 'reply', 'id': call_id, 'result': {
+                    'scenes': [{'sceneID': str(i * 7919)}
+                               for i in range(count)]}})))
+            with self.assertRaises(KeyError):
+                yield from call
+
+        self._queue.put_nowait(server.encode(sample_method))
+        yield from connection.has_packet()
+        self.assertEqual('some_method', connection.get_packet().name)
+        self.assertFalse(connection._recv_task.done())
+        connection._recv_task.cancel()
+        self.assertEqual(1, connection.stats['frames_streamed'])
+
+    @async_test
+    def test_parses_calls_lazily_and_filters_methods(self):
+        connection = Connection(socket=self._mock_socket, loop=self._loop,
+                                lazy_calls=True)
+        connection.method_filter = {'some_method', 'batched'}
+        yield from connection.connect()
+        self._queue.put_nowait(
+            '{"type":"method","method":"giveInput","params":{}}')
+        self._queue.put_nowait(sample_method)
+        self._queue.put_nowait(
+            '[{"type":"method","method":"batched","params":1},'
+            '{"type":"method","method":"giveInput","params":2}]')
+
+        calls = []
+        while len(calls) < 2:
+            yield from connection.has_packet()
+            calls.extend(connection.get_packets())
+        connection._recv_task.cancel()
+
+        self.assertEqual(['some_method', 'batched'], [c.name for c in calls])
+        self.assertIsNone(calls[0]._payload)
+        self.assertEqual({'foo': 42}, calls[0].data)
+        self.assertEqual(2, connection.stats['calls_filtered'])
+
+    @async_test
+    def test_decodes_typed_messages(self):
+        connection = Connection(socket=self._mock_socket, loop=self._loop,
+                                lazy_calls=True, typed_messages=True)
+        yield from connection.connect()
+        self._queue.put_nowait(
+            '{"type":"method","method":"giveInput","params":{'
+            '"participantID":"p","input":{"controlID":"stick",'
+            '"event":"move","x":0.5,"y":-1}},"id":0,"discard":true}')
+        self._queue.put_nowait(sample_method)
+
+        calls = []
+        while len(calls) < 2:
+            yield from connection.has_packet()
+            calls.extend(connection.get_packets())
+        connection._recv_task.cancel()
+
+        self.assertIsInstance(calls[0], JoystickInput)
+        self.assertEqual((0.5, -1), (calls[0].x, calls[0].y))
+        self.assertEqual('stick', calls[0].data['input']['controlID'])
+        self.assertEqual({'foo': 42}, calls[1].data)
+
+    @async_test
+    def test_queued_sends_prioritize_captures(self):
+        connection = Connection(socket=self._mock_socket, loop=self._loop,
+                                send_high_watermark=100)
+        yield from connection.connect()
+        yield from connection.call('updateControls', {}, discard=True)
+        yield from connection.call('capture', {}, discard=True)
+        self.assertEqual(2, connection.send_queue_depth)
+        for _ in range(3):
+            yield from asyncio.sleep(0, loop=self._loop)
+        connection._recv_task.cancel()
+        connection._send_task.cancel()
+
+        methods = [json.loads(c[0][0])['method']
+                   for c in self._mock_socket.send.call_args_list]
+        self.assertEqual(['capture', 'updateControls'], methods)
+        self.assertEqual(1, connection.stats['send_prioritized'])
+
+    @async_test
+    def test_collapses_identical_reads(self):
+        connection = Connection(socket=self._mock_socket, loop=self._loop,
+                                collapse_calls=True)
+        yield from connection.connect()
+        calls = asyncio.gather(connection.call('getScenes'),
+                               connection.call('getScenes'), loop=self._loop)
+        yield from asyncio.sleep(0.01, loop=self._loop)
+        yield from self._queue.put(
+            '{"id":0,"type":"reply","result":{"scenes":[]}}')
+        results = yield from calls
+        connection._recv_task.cancel()
+
+        self.assertEqual({'scenes': []}, results[0])
+        self.assertEqual(results[0], results[1])
+        self.assertIsNot(results[0], results[1])
+        self.assertEqual(1, self._mock_socket.send.call_count)
+        self.assertEqual(1, connection.stats['calls_collapsed'])
+
+    @async_test
+    def test_collapses_calls_with_sinks(self):
+        connection = Connection(socket=self._mock_socket, loop=self._loop,
+                                collapse_calls=True, stream_threshold=0)
+        yield from connection.connect()
+        first, second = [], []
+
+        def fail(scene):
+            raise KeyError(scene['sceneID'])
+
+        calls = asyncio.gather(
+            connection.call('getScenes', sinks={'scenes': first.append}),
+            connection.call('getScenes', sinks={'scenes': second.append}),
+            connection.call('getScenes', sinks={'scenes': fail}),
+            loop=self._loop, return_exceptions=True)
+        yield from asyncio.sleep(0.01, loop=self._loop)
+        yield from self._queue.put(
+            '{"id":0,"type":"reply","result":{"scenes":['
+            '{"sceneID":"a"},{"sceneID":"b"}]}}')
+        results = yield from calls
+
+        # Joining once the reply has been read makes a call of its own.
+        late = asyncio.ensure_future(
+            connection.call('getScenes', sinks={'scenes': first.append}),
+            loop=self._loop)
+        yield from asyncio.sleep(0.01, loop=self._loop)
+        yield from self._queue.put(
+            '{"id":1,"type":"reply","result":{"scenes":[{"sceneID":"c"}]}}')
+        yield from late
+        connection._recv_task.cancel()
+
+        self.assertEqual([{'scenes': []}, {'scenes': []}], results[:2])
+        self.assertIsInstance(results[2], KeyError)
+        self.assertEqual(['a', 'b', 'c'], [s['sceneID'] for s in first])
+        self.assertEqual(first[:2], second)
+        self.assertIsNot(first[0], second[0])
+        self.assertEqual(2, self._mock_socket.send.call_count)
+        self.assertEqual(2, connection.stats['calls_collapsed'])
+
+    @async_test
+    def test_ignores_sinks_on_replies_without_a_result_object(self):
+        yield from self._connection.connect()
+        for result in ('null', '[1,2]'):
+            call_id = self._connection._call_counter
+            call = asyncio.ensure_future(self._connection.call(
+                'getScenes', sinks={'scenes': list.append}), loop=self._loop)
+            yield from asyncio.sleep(0, loop=self._loop)
+            self._queue.put_nowait('{{"type":"reply","id":{},"result":{}}}'
+                                   .format(call_id, result))
+            self.assertEqual(json.loads(result), (yield from call))
+
+        call = asyncio.ensure_future(self._connection.call(
+            'getScenes', sinks={'scenes': list.append}), loop=self._loop)
+        yield from asyncio.sleep(0, loop=self._loop)
+        self.assertEqual(1, len(self._connection._stream_sinks))
+        self._queue.put_nowait('{"type":"reply","id":2,"error":{}}')
+        yield from call
+        self.assertEqual({}, self._connection._stream_sinks)
+        self.assertFalse(self._connection._recv_task.done())
+
+    def _scripted_socket(self, frames):
+        socket = Mock()
+        socket.send.return_value = self._mock_socket.close
+        socket.close.return_value = self._mock_socket.close
+        frames = list(frames)
+
+        async def recv():
+            if not frames:
+                await asyncio.Future(loop=self._loop)  # never answers
+            frame = frames.pop(0)
+            if isinstance(frame, Exception):
+                raise frame
+            return frame
+
+        socket.recv = recv
+        return socket
+
+    @async_test
+    def test_keeps_reconnecting_after_a_bad_hello(self):
+        hello = '{"type":"method","method":"hello"}'
+        first = self._scripted_socket(
+            [hello, websockets.ConnectionClosed(1006, 'dropped')])
+        garbled = self._scripted_socket(['not json'])
+        last = self._scripted_socket([hello, sample_method])
+        connection = Connection(socket=first, loop=self._loop,
+                                reconnect=True, reconnect_delay=0.001)
+        sockets = [garbled, last]
+        connection._connector = lambda: resolve(sockets.pop(0))
+        yield from connection.connect()
+
+        self.assertTrue((yield from asyncio.wait_for(
+            connection.has_packet(), 1, loop=self._loop)))
+        self.assertEqual('some_method', connection.get_packet().name)
+        self.assertEqual(1, garbled.close.call_count)
+        connection._recv_task.cancel()
+
     @async_test
     def test_times_out_calls(self):
         yield from self._connection.connect()
@@ -119,5 +472,6 @@ class TestInteractiveConnection(AsyncTestCase):
 
         has_packet = yield from self._connection.has_packet()
         self.assertTrue(has_packet)  # reads what we pushed to get unblocked
+        self._connection.get_packet()
         has_packet = yield from self._connection.has_packet()
         self.assertFalse(has_packet)  # gets a connection closed
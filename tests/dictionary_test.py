@@ -0,0 +1,34 @@
+import os
+import tempfile
+import unittest
+from beam_interactive2 import Recorder
+from beam_interactive2.capture import RECV
+from beam_interactive2.dictionary import build_dictionary, read_messages
+
+messages = [
+    '{"method":"giveInput","params":{"participantID":"%s"}}' % i
+    for i in range(20)
+]
+
+
+class TestBuildDictionary(unittest.TestCase):
+    def test_keeps_common_fragments(self):
+        dictionary = build_dictionary(messages, size=64)
+        self.assertLessEqual(len(dictionary), 64)
+        self.assertIn(b'"method":"giveInput"', dictionary)
+        self.assertNotIn(b'"7"', dictionary)
+
+    def test_reads_recordings_and_text(self):
+        directory = tempfile.mkdtemp()
+        recording = os.path.join(directory, 'session.rec')
+        recorder = Recorder(recording)
+        for message in messages[:2]:
+            recorder.record(RECV, message)
+        recorder.close()
+
+        text = os.path.join(directory, 'messages.json')
+        with open(text, 'w') as f:
+            f.write('\n'.join(messages[2:4]) + '\n\n')
+
+        self.assertEqual(messages[:2], list(read_messages(recording)))
+        self.assertEqual(messages[2:4], list(read_messages(text)))
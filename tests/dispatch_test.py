@@ -0,0 +1,99 @@
+import asyncio
+import unittest
+
+from pyee import PyeeException
+
+from beam_interactive2 import DispatchEmitter
+from ._util import AsyncTestCase, async_test
+
+
+def recorder():
+    calls = []
+
+    def record(x):
+        calls.append(x)
+    return calls, record
+
+
+class TestDispatchEmitter(unittest.TestCase):
+
+    def test_calls_listeners_in_order(self):
+        emitter, calls = DispatchEmitter(), []
+        emitter.on('a', lambda x: calls.append(('first', x)))
+
+        @emitter.on('a')
+        def second(x):
+            calls.append(('second', x))
+
+        self.assertTrue(emitter.emit('a', 1))
+        self.assertFalse(emitter.emit('b', 2))
+        self.assertEqual([('first', 1), ('second', 1)], calls)
+
+    def test_rebuilds_when_listeners_change(self):
+        emitter, (calls, record) = DispatchEmitter(), recorder()
+        emitter.emit('a', 0)
+        emitter.on('a', record)
+        emitter.emit('a', 1)
+        emitter.remove_listener('a', record)
+        emitter.emit('a', 2)
+        emitter.on('a', record)
+        emitter.remove_all_listeners()
+        emitter.emit('a', 3)
+        self.assertEqual([1], calls)
+
+    def test_once_listeners_run_once(self):
+        emitter, (calls, record) = DispatchEmitter(), recorder()
+        emitter.once('a', record)
+        emitter.emit('a', 1)
+        emitter.emit('a', 2)
+        self.assertEqual([1], calls)
+        self.assertEqual([], emitter.listeners('a'))
+
+    def test_changes_during_emit_apply_from_the_next(self):
+        emitter, calls = DispatchEmitter(), []
+
+        def first(x):
+            calls.append(('first', x))
+            emitter.remove_listener('a', second)
+            emitter.on('a', third)
+
+        def second(x):
+            calls.append(('second', x))
+
+        def third(x):
+            calls.append(('third', x))
+
+        emitter.on('a', first)
+        emitter.on('a', second)
+        emitter.emit('a', 1)
+        emitter.remove_listener('a', first)
+        emitter.emit('a', 2)
+        self.assertEqual([('first', 1), ('second', 1), ('third', 2)], calls)
+
+    def test_raises_unhandled_errors(self):
+        with self.assertRaises(ValueError):
+            DispatchEmitter().emit('error', ValueError())
+        with self.assertRaises(PyeeException):
+            DispatchEmitter().emit('error')
+
+
+class TestDispatchEmitterCoroutines(AsyncTestCase):
+
+    @async_test
+    def test_schedules_coroutines_and_emits_their_errors(self):
+        emitter = DispatchEmitter(loop=self._loop)
+        done = asyncio.Future(loop=self._loop)
+        errors, record = recorder()
+
+        async def handler(x):
+            if x == 'fail':
+                raise ValueError(x)
+            done.set_result(x)
+
+        emitter.on('a', handler)
+        emitter.on('error', record)
+        emitter.emit('a', 'fail')
+        emitter.emit('a', 'ok')
+        self.assertEqual('ok', (yield from done))
+        yield from asyncio.sleep(0, loop=self._loop)
+        self.assertEqual(['fail'], [str(e) for e in errors])
@@ -1,5 +1,7 @@
 import unittest
-from beam_interactive2 import GzipEncoding
+from beam_interactive2 import GzipEncoding, DictionaryEncoding, \
+    EncodingException
+from beam_interactive2.encoding import read_varint, write_varint
 from ._util import fixture
 
 samples = 3
@@ -23,3 +25,69 @@ class TestGzipEncoding(unittest.TestCase):
                 fixture('sample{}_encoded'.format(i), 'rb'))
             self.assertEqual(py_decoded, go_decoded)
 
+
+    def test_many_messages_share_one_stream(self):
+        encoder, decoder = GzipEncoding(), GzipEncoding()
+        for i in range(200):
+            message = '{"type":"method","id":%d,"params":{}}' % i
+            self.assertEqual(message, decoder.decode(encoder.encode(message)))
+
+    def test_decodes_in_chunks(self):
+        encoder, decoder = GzipEncoding(), GzipEncoding()
+        for i in range(samples):
+            sample = fixture('sample{}_decoded'.format(i))
+            chunks = list(decoder.decode_chunks(encoder.encode(sample), 64))
+            self.assertEqual(sample, ''.join(chunks))
+            self.assertLessEqual(max(len(c) for c in chunks), 64)
+        # the stream is left where decode() expects it
+        self.assertEqual('{}', decoder.decode(encoder.encode('{}')))
+
+    def test_rejects_corrupt_frames(self):
+        with self.assertRaises(EncodingException):
+            GzipEncoding().decode(b'\x05not gzip')
+        with self.assertRaises(EncodingException):
+            GzipEncoding().decode(b'\x80')
+
+
+class TestDictionaryEncoding(unittest.TestCase):
+    def test_round_trip(self):
+        for dictionary in (None, b'"participantID":"'):
+            encoder = DictionaryEncoding(dictionary)
+            decoder = DictionaryEncoding(dictionary)
+            for i in range(samples):
+                sample = fixture('sample{}_decoded'.format(i))
+                self.assertEqual(sample,
+                                 decoder.decode(encoder.encode(sample)))
+
+    def test_compresses_better_than_gzip_when_cold(self):
+        message = '{"type":"method","method":"giveInput","params":{' \
+                  '"participantID":"abc","input":{"controlID":"fire",' \
+                  '"event":"mousedown","button":0}},"id":0,"discard":true}'
+        self.assertLess(len(DictionaryEncoding().encode(message)),
+                        len(GzipEncoding().encode(message)))
+
+    def test_fresh_keeps_settings(self):
+        encoding = DictionaryEncoding(b'"controlID":"fire"', 1)
+        encoding.encode('{"controlID":"fire"}')
+        fresh = encoding.fresh()
+        self.assertEqual(b'"controlID":"fire"', fresh.dictionary)
+        self.assertEqual(1, fresh.compression_level)
+        message = '{"controlID":"fire"}'
+        self.assertEqual(message, DictionaryEncoding(
+            b'"controlID":"fire"').decode(fresh.encode(message)))
+
+    def test_needs_the_same_dictionary(self):
+        encoded = DictionaryEncoding(b'"controlID":"fire"').encode(
+            '{"controlID":"fire"}')
+        with self.assertRaises(EncodingException):
+            DictionaryEncoding(b'something else').decode(encoded)
+
+
+class TestVarint(unittest.TestCase):
+    def test_round_trip(self):
+        for value, encoded in [(0, b'\x00'), (127, b'\x7f'),
+                               (128, b'\x80\x01'), (300, b'\xac\x02'),
+                               (2 ** 32, b'\x80\x80\x80\x80\x10')]:
+            self.assertEqual(encoded, write_varint(value))
+            self.assertEqual((value, len(encoded)),
+                             read_varint(memoryview(encoded + b'tail')))
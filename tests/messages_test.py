@@ -0,0 +1,51 @@
+import unittest
+from beam_interactive2 import ButtonInput, JoystickInput, ParticipantJoin, \
+    ParticipantLeave, ParticipantUpdate, ControlUpdate
+from beam_interactive2.messages import decode_message
+from beam_interactive2 import traffic
+
+
+class TestMessages(unittest.TestCase):
+    def test_round_trips_traffic(self):
+        p = traffic.participant()
+        packets = [
+            (ButtonInput, traffic.button_input('s1', 'fire', 'mouseup', 't')),
+            (JoystickInput, traffic.joystick_input('s1', 'stick')),
+            (ParticipantJoin, traffic.participant_join([p])),
+            (ParticipantLeave, traffic.participant_leave([p])),
+            (ParticipantUpdate, traffic.participant_update([p])),
+            (ControlUpdate, traffic.control_update(
+                'default', traffic.default_scenes()[0]['controls'])),
+        ]
+        for cls, packet in packets:
+            packet['params']['seq'] = 7
+            message = decode_message(None, packet)
+            self.assertIs(cls, type(message))
+            self.assertEqual(packet['method'], message.name)
+            self.assertEqual(packet['params'], message.data)
+            self.assertEqual(packet, message.payload)
+            self.assertFalse(hasattr(message, '__dict__'))
+
+    def test_typed_fields(self):
+        button = decode_message(None, traffic.button_input('s1', 'fire'))
+        self.assertEqual(('s1', 'fire', 'mousedown', 0),
+                         (button.participant_id, button.control_id,
+                          button.event, button.button))
+        stick = decode_message(None, traffic.joystick_input('s2', 'j', 1, 0))
+        self.assertEqual((1, 0), (stick.x, stick.y))
+        join = decode_message(None, traffic.participant_join(
+            [traffic.participant(session_id='abc', username='bob')]))
+        self.assertEqual(('abc', 'bob'), (join.participants[0].session_id,
+                                          join.participants[0].username))
+
+    def test_keeps_changes_to_data(self):
+        stick = decode_message(None, traffic.joystick_input('s2', 'j', 1, 0))
+        stick.data['input']['x'] = 0.5
+        self.assertIs(stick.data, stick.data)
+        self.assertEqual(0.5, stick.data['input']['x'])
+        self.assertIs(stick.data, stick.payload['params'])
+
+    def test_leaves_other_calls_alone(self):
+        self.assertIsNone(decode_message(None, traffic.method('hello', {})))
+        self.assertIsNone(decode_message(None, traffic.method(
+            'giveInput', {'participantID': 's1', 'input': {'event': 'x'}})))
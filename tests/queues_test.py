@@ -0,0 +1,92 @@
+import asyncio
+
+from beam_interactive2 import Call
+from beam_interactive2.queues import RecvQueue, SendQueue
+from ._util import AsyncTestCase, async_test
+
+
+def make_call(method, params=None):
+    return Call(None, {'type': 'method', 'method': method, 'params': params})
+
+
+def drain(queue):
+    calls = []
+    while len(queue) > 0:
+        calls.append(queue.popleft())
+    return [(c.name, c.data) for c in calls]
+
+
+class TestRecvQueue(AsyncTestCase):
+
+    def test_drops_oldest(self):
+        queue = RecvQueue(2, 'drop_oldest')
+        for i in range(3):
+            queue.append(make_call('giveInput', i))
+
+        self.assertEqual([('giveInput', 1), ('giveInput', 2)], drain(queue))
+        self.assertEqual(1, queue.stats['recv_dropped_oldest'])
+
+    def test_drops_newest(self):
+        queue = RecvQueue(2, 'drop_newest')
+        for i in range(3):
+            queue.append(make_call('giveInput', i))
+
+        self.assertEqual([('giveInput', 0), ('giveInput', 1)], drain(queue))
+        self.assertEqual(1, queue.stats['recv_dropped_newest'])
+
+    def test_coalesces_by_method(self):
+        queue = RecvQueue(2, 'coalesce')
+        queue.append(make_call('giveInput', 0))
+        queue.append(make_call('onParticipantJoin', 1))
+        queue.append(make_call('giveInput', 2))
+        self.assertEqual(('giveInput', 2), (queue._items[0].name,
+                                            queue._items[0].data))
+        queue.append(make_call('onControlUpdate', 3))
+
+        self.assertEqual([('onParticipantJoin', 1), ('onControlUpdate', 3)],
+                         drain(queue))
+        self.assertEqual(1, queue.stats['recv_coalesced'])
+        self.assertEqual(1, queue.stats['recv_dropped_oldest'])
+
+    def test_rejects_unknown_policies(self):
+        with self.assertRaises(ValueError):
+            RecvQueue(2, 'explode')
+
+    @async_test
+    def test_blocks_until_consumed(self):
+        queue = RecvQueue(1, 'block', loop=self._loop)
+        queue.append(make_call('giveInput', 0))
+        waiter = asyncio.ensure_future(queue.wait_for_space(),
+                                       loop=self._loop)
+        yield from asyncio.sleep(0, loop=self._loop)
+        self.assertFalse(waiter.done())
+
+        queue.popleft()
+        yield from waiter
+        self.assertEqual(1, queue.stats['recv_blocked'])
+
+
+class TestSendQueue(AsyncTestCase):
+
+    def test_sends_priority_packets_first(self):
+        queue = SendQueue(10)
+        queue.put('bulk')
+        queue.put('capture', priority=True)
+        self.assertEqual(['capture', 'bulk'], queue.take(5))
+
+    def test_sheds_discardable_packets_between_watermarks(self):
+        queue = SendQueue(high_watermark=3, low_watermark=1)
+        for i in range(3):
+            self.assertTrue(queue.put(i, discardable=True))
+        self.assertFalse(queue.put(3, discardable=True))
+        self.assertTrue(queue.put(4))
+        self.assertTrue(queue.shedding)
+
+        queue.take(2)
+        self.assertFalse(queue.put(5, discardable=True))
+        queue.take(1)
+        self.assertFalse(queue.shedding)
+        self.assertTrue(queue.put(6, discardable=True))
+        self.assertEqual([4, 6], queue.take(5))
+        self.assertEqual(2, queue.stats['send_dropped'])
+        self.assertEqual(1, queue.stats['send_shedding'])
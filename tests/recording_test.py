@@ -0,0 +1,75 @@
+import os
+import shutil
+import tempfile
+
+from beam_interactive2 import Connection, Recorder, ReplaySocket, \
+    read_recording
+from beam_interactive2.standin import StandInServer
+from beam_interactive2.traffic import button_input
+from ._util import AsyncTestCase, async_test
+
+
+class TestRecording(AsyncTestCase):
+
+    def setUp(self):
+        super(TestRecording, self).setUp()
+        self._dir = tempfile.mkdtemp()
+        self._path = os.path.join(self._dir, 'session.rec')
+
+    def tearDown(self):
+        shutil.rmtree(self._dir)
+        super(TestRecording, self).tearDown()
+
+    def test_appends_frames(self):
+        recorder = Recorder(self._path)
+        recorder.record('RCV', '{"type":"method","method":"hello"}')
+        recorder.close()
+        recorder = Recorder(self._path)
+        recorder.record('SEND', '{"id":0}')
+        recorder.close()
+
+        frames = [r[1:] for r in read_recording(self._path)]
+        self.assertEqual([('RCV', '{"type":"method","method":"hello"}'),
+                          ('SEND', '{"id":0}')], frames)
+
+    @async_test
+    def test_replays_received_frames(self):
+        recorder = Recorder(self._path)
+        recorder.record('RCV', '{"type":"method","method":"hello"}')
+        recorder.record('SEND', '{"type":"method","method":"ready"}')
+        recorder.record('RCV', '{"type":"method","method":"giveInput",'
+                               '"params":{"foo":1}}')
+        recorder.close()
+
+        socket = ReplaySocket(self._path, speed=None, loop=self._loop)
+        connection = Connection(socket=socket, loop=self._loop)
+        yield from connection.connect()
+
+        self.assertTrue((yield from connection.has_packet()))
+        self.assertEqual({'foo': 1}, connection.get_packet().data)
+        self.assertFalse((yield from connection.has_packet()))
+
+    @async_test
+    def test_records_a_live_session(self):
+        server = StandInServer(loop=self._loop)
+        yield from server.start()
+        connection = Connection(address=server.address, loop=self._loop)
+        connection.recorder = Recorder(self._path)
+        yield from connection.connect()
+        yield from connection.call('getScenes')
+        yield from server.broadcast(button_input('p', 'b'))
+        yield from connection.has_packet()
+
+        # Frames are on disk as soon as they're recorded.
+        directions = [r[1] for r in read_recording(self._path)]
+        self.assertEqual(['RCV', 'SEND', 'RCV', 'RCV'], directions)
+
+        yield from connection.close()
+        yield from server.close()
+        self.assertTrue(connection.recorder._file.closed)
+
+        socket = ReplaySocket(self._path, speed=None, loop=self._loop)
+        replayed = Connection(socket=socket, loop=self._loop)
+        yield from replayed.connect()
+        self.assertTrue((yield from replayed.has_packet()))
+        self.assertEqual('giveInput', replayed.get_packet().name)
@@ -0,0 +1,234 @@
+import asyncio
+
+from beam_interactive2 import Connection, GzipEncoding, DictionaryEncoding, \
+    PerMessageDeflate, State
+from beam_interactive2.traffic import participant, participant_leave, \
+    participant_update
+from beam_interactive2.standin import StandInServer
+from ._util import AsyncTestCase, async_test
+
+
+async def collect(pages):
+    collected = []
+    async for page in pages:
+        collected.append(page)
+    return collected
+
+
+class TestStandInServer(AsyncTestCase):
+
+    def setUp(self):
+        super(TestStandInServer, self).setUp()
+        self._server = StandInServer(loop=self._loop)
+        self._loop.run_until_complete(self._server.start())
+        self._connection = Connection(address=self._server.address,
+                                      loop=self._loop)
+        self._loop.run_until_complete(self._connection.connect())
+
+    def tearDown(self):
+        self._loop.run_until_complete(self._connection.close())
+        self._loop.run_until_complete(self._server.close())
+        super(TestStandInServer, self).tearDown()
+
+    @async_test
+    def test_answers_calls(self):
+        scenes = yield from self._connection.call('getScenes')
+        self.assertEqual('default', scenes['scenes'][0]['sceneID'])
+        self.assertTrue((yield from self._connection.set_compression(
+            GzipEncoding())))
+        groups = yield from self._connection.call('getGroups')
+        self.assertEqual('default', groups['groups'][0]['groupID'])
+        self.assertEqual(1, self._server.stats['getGroups'])
+
+    @async_test
+    def test_negotiates_dictionary_compression(self):
+        self.assertTrue((yield from self._connection.set_compression(
+            DictionaryEncoding())))
+        scenes = yield from self._connection.call('getScenes')
+        self.assertEqual('default', scenes['scenes'][0]['sceneID'])
+
+    @async_test
+    def test_sends_swarm_traffic(self):
+        swarm = self._server.swarm(size=5, input_rate=200)
+        yield from swarm.run(duration=0.1)
+        yield from asyncio.sleep(0.01, loop=self._loop)
+
+        calls = []
+        while len(self._connection._recv_queue) > 0:
+            calls.append(self._connection.get_packet().name)
+
+        self.assertEqual(swarm.stats['join'], 5)
+        self.assertEqual(swarm.stats['input'], calls.count('giveInput'))
+        self.assertGreater(swarm.stats['input'], 0)
+        self.assertIn('onParticipantJoin', calls)
+
+    @async_test
+    def test_negotiates_transport_compression(self):
+        deflate = PerMessageDeflate(level=1, max_window_bits=10,
+                                    server_max_window_bits=10)
+        server = StandInServer(transport_compression=deflate, loop=self._loop)
+        yield from server.start()
+        for setting, negotiated in [(deflate, ['permessage-deflate']),
+                                    (False, [])]:
+            connection = Connection(address=server.address, loop=self._loop,
+                                    transport_compression=setting)
+            yield from connection.connect()
+            scenes = yield from connection.call('getScenes')
+            self.assertEqual('default', scenes['scenes'][0]['sceneID'])
+            self.assertEqual(negotiated, [extension.name for extension in
+                                          connection._socket.extensions])
+            yield from connection.close()
+        yield from server.close()
+
+    @async_test
+    def test_reconnects_and_resyncs(self):
+        connection = Connection(address=self._server.address,
+                                loop=self._loop, reconnect=True,
+                                reconnect_delay=0.01)
+        yield from connection.connect()
+        state = State(connection)
+        yield from connection.set_compression(GzipEncoding())
+        self._server.participants['a'] = participant('a')
+
+        yield from self._server.disconnect_all()
+        result = yield from connection.call('getTime', replay=True)
+        self.assertIn('time', result)
+        yield from asyncio.sleep(0.05, loop=self._loop)
+
+        self.assertEqual(1, connection.stats['reconnects'])
+        self.assertEqual('gzip', connection._encoding.name())
+        self.assertEqual(['a'], list(state.participants))
+        self.assertIn('default', state.groups)
+        yield from connection.close()
+
+    @async_test
+    def test_resyncs_every_page_of_participants(self):
+        self._server.page_size = 10
+        for i in range(25):
+            p = participant('p{}'.format(i))
+            p['connectedAt'] = 1000 + i
+            self._server.participants[p['sessionID']] = p
+        connection = Connection(address=self._server.address,
+                                loop=self._loop, reconnect=True,
+                                reconnect_delay=0.01)
+        yield from connection.connect()
+        state = State(connection)
+        yield from state.get_participants()
+        self.assertEqual(25, len(state.participants))
+
+        self._server.participants.pop('p3')
+        yield from self._server.disconnect_all()
+        yield from connection.call('getTime', replay=True)
+        yield from asyncio.sleep(0.05, loop=self._loop)
+
+        self.assertEqual(24, len(state.participants))
+        self.assertNotIn('p3', state.participants)
+        self.assertEqual(6, self._server.stats['getAllParticipants'])
+        yield from connection.close()
+
+    @async_test
+    def test_reconnects_with_the_same_dictionary(self):
+        dictionary = b'"sceneID":"default","controls":['
+        server = StandInServer(dictionary=dictionary, loop=self._loop)
+        yield from server.start()
+        connection = Connection(address=server.address, loop=self._loop,
+                                reconnect=True, reconnect_delay=0.01)
+        yield from connection.connect()
+        yield from connection.set_compression(DictionaryEncoding(dictionary))
+
+        yield from server.disconnect_all()
+        yield from asyncio.sleep(0.05, loop=self._loop)
+        scenes = yield from connection.call('getScenes')
+
+        self.assertEqual('default', scenes['scenes'][0]['sceneID'])
+        self.assertEqual(dictionary, connection._encoding.dictionary)
+        yield from connection.close()
+        yield from server.close()
+
+    @async_test
+    def test_bootstraps_in_one_round_trip(self):
+        self._server.latency = 0.05
+        self._server.participants['a'] = participant('a')
+        state = State(self._connection)
+        start = self._loop.time()
+        timings = yield from state.bootstrap(compression=GzipEncoding(),
+                                             ready=True)
+        elapsed = self._loop.time() - start
+
+        self.assertLess(elapsed, 0.05 * 3)  # serially, it'd be 6 trips
+        self.assertEqual('gzip', self._connection._encoding.name())
+        self.assertIn('default', state.scenes)
+        self.assertIn('default', state.groups)
+        self.assertEqual(['a'], list(state.participants))
+        self.assertEqual(1, self._server.stats['ready'])
+        self.assertEqual({'setCompression', 'getTime', 'getScenes',
+                          'getGroups', 'getAllParticipants', 'ready',
+                          'bootstrap'}, set(timings))
+
+    @async_test
+    def test_collapses_concurrent_scene_loads(self):
+        connection = Connection(address=self._server.address,
+                                loop=self._loop, collapse_calls=True)
+        yield from connection.connect()
+        states = [State(connection), State(connection)]
+        yield from asyncio.gather(*[s.get_scenes() for s in states],
+                                  loop=self._loop)
+        yield from connection.close()
+
+        self.assertEqual(1, self._server.stats['getScenes'])
+        self.assertIn('default', states[0].scenes)
+        self.assertIn('default', states[1].scenes)
+        self.assertIsNot(states[0].scenes['default'],
+                         states[1].scenes['default'])
+
+    @async_test
+    def test_loads_every_page_of_participants(self):
+        self._server.page_size = 100
+        for i in range(1000):
+            p = participant('p{}'.format(i))
+            p['connectedAt'] = 1000 + i
+            self._server.participants[p['sessionID']] = p
+
+        state = State(self._connection)
+        yield from state.bootstrap()
+        self.assertEqual(1000, len(state.participants))
+
+        state.participants['gone'] = participant('gone')
+        self._server.participants.pop('p0')
+        yield from state.get_participants()
+        self.assertEqual(999, len(state.participants))
+        self.assertNotIn('gone', state.participants)
+        self.assertEqual(22, self._server.stats['getAllParticipants'])
+
+    @async_test
+    def test_pages_participants_while_events_apply(self):
+        self._server.page_size = 10
+        for i in range(35):
+            p = participant('p{}'.format(i))
+            p['connectedAt'] = 1000 + i
+            self._server.participants[p['sessionID']] = p
+        state = State(self._connection)
+        state.pump_async(loop=self._loop)
+        pages = state.participant_pages()
+        first = yield from pages.__anext__()
+        self.assertEqual(10, len(first))
+
+        # The next page is read before these events are sent, but arrives
+        # after them, so it's out of date for those two participants.
+        self._server.latency = 0.05
+        second = asyncio.ensure_future(pages.__anext__(), loop=self._loop)
+        yield from asyncio.sleep(0.01, loop=self._loop)
+        gone = self._server.participants.pop('p16')
+        yield from self._server.broadcast(participant_leave([gone]))
+        renamed = dict(self._server.participants['p15'], username='fresh')
+        self._server.participants['p15'] = renamed
+        yield from self._server.broadcast(participant_update([renamed]))
+        yield from second
+        self._server.latency = 0
+        rest = yield from collect(pages)
+
+        self.assertEqual(34, len(state.participants))
+        self.assertNotIn('p16', state.participants)
+        self.assertEqual('fresh', state.participants['p15']['username'])
+        self.assertEqual(2, pages.skipped)
+        self.assertEqual(2 + len(rest), pages.pages)
@@ -0,0 +1,47 @@
+import json
+import unittest
+
+from beam_interactive2.streaming import ReplyStream
+
+reply = {'type': 'reply', 'id': 3,
+         'result': {'scenes': [{'sceneID': 'a', 'controls': [{'x': '],'}]},
+                               {'sceneID': 'b', 'controls': []}, 7, 'c'],
+                    'meta': {'scenes': [1]}}}
+
+
+def stream(text, size, route):
+    replies = ReplyStream(route)
+    for start in range(0, len(text), size):
+        replies.feed(text[start:start + size])
+    return replies, json.loads(replies.close())
+
+
+class TestReplyStream(unittest.TestCase):
+    def test_passes_items_to_sinks_across_chunks(self):
+        text = json.dumps(reply)
+        for size in (1, 7, len(text)):
+            items = []
+            replies, rest = stream(text, size,
+                                   {3: {'scenes': items.append}}.get)
+            self.assertEqual(reply['result']['scenes'], items)
+            self.assertEqual(4, replies.streamed)
+            self.assertEqual({'type': 'reply', 'id': 3,
+                              'result': {'scenes': [],
+                                         'meta': {'scenes': [1]}}}, rest)
+
+    def test_keeps_replies_to_other_calls(self):
+        text = json.dumps(reply)
+        replies, rest = stream(text, 5, {4: {'scenes': None}}.get)
+        self.assertEqual(reply, rest)
+        self.assertEqual(0, replies.streamed)
+
+    def test_keeps_arrays_before_the_id(self):
+        text = '{"result":{"scenes":[1,2]},"id":3}'
+        replies, rest = stream(text, 4, {3: {'scenes': None}}.get)
+        self.assertEqual({'result': {'scenes': [1, 2]}, 'id': 3}, rest)
+
+    def test_rejects_truncated_arrays(self):
+        replies = ReplyStream({0: {'scenes': lambda item: None}}.get)
+        replies.feed('{"id":0,"result":{"scenes":[{"a":1},')
+        with self.assertRaises(ValueError):
+            replies.close()
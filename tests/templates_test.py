@@ -0,0 +1,55 @@
+import json
+import unittest
+from beam_interactive2 import JsonCodec, available_codecs
+from beam_interactive2.templates import PacketTemplates
+
+
+def method(call_id, name, params, discard=False):
+    return {'type': 'method', 'id': call_id, 'method': name,
+            'params': params, 'discard': discard}
+
+
+packets = [
+    method(0, 'capture', {'transactionID': 'a1b2-c3d4'}),
+    method(1, 'capture', {'transactionID': 'ünïcode "quoted"'}, True),
+    method(2, 'updateControls', {
+        'sceneID': 'default',
+        'controls': [{'controlID': 'fire', 'cooldown': 1500000000000,
+                      'etag': None, 'disabled': False}],
+    }),
+    {'type': 'reply', 'id': 4, 'result': {'nested': [1, 2.5, 'x']}},
+    # Shapes which don't fit a template, and go through the codec.
+    method(7, 'capture', {'transactionID': 'x', 'extra': 1}),
+    method(8, 'getScenes', {}),
+    {'type': 'reply', 'id': 9, 'result': 1, 'error': 2},
+]
+
+
+class TestPacketTemplates(unittest.TestCase):
+    def test_matches_json_dumps(self):
+        templates = PacketTemplates(JsonCodec())
+        for packet in packets:
+            self.assertEqual(json.dumps(packet, separators=(',', ':')),
+                             templates.dumps(packet))
+
+    def test_matches_every_codec(self):
+        for codec in available_codecs():
+            templates = PacketTemplates(codec)
+            for packet in packets:
+                self.assertEqual(codec.dumps(packet), templates.dumps(packet))
+
+    def test_fits_keys_in_any_order(self):
+        templates = PacketTemplates(JsonCodec())
+        packet = {'discard': False, 'params': {'transactionID': 'x'},
+                  'method': 'capture', 'id': 3, 'type': 'method'}
+        self.assertEqual('{"type":"method","id":3,"method":"capture",'
+                         '"params":{"transactionID":"x"},"discard":false}',
+                         templates.dumps(packet))
+
+    def test_fragment_cache_is_bounded(self):
+        templates = PacketTemplates(JsonCodec(), cache_size=2)
+        for i in range(5):
+            packet = method(i, 'capture', {'transactionID': str(i)})
+            self.assertEqual(json.dumps(packet, separators=(',', ':')),
+                             templates.dumps(packet))
+        self.assertLessEqual(len(templates._cache), 2)
@@ -0,0 +1,41 @@
+import asyncio
+
+from beam_interactive2.timeouts import TimeoutWheel
+from ._util import AsyncTestCase, async_test
+
+
+class TestTimeoutWheel(AsyncTestCase):
+
+    @async_test
+    def test_expires_pending_futures(self):
+        wheel = TimeoutWheel(self._loop, resolution=0.01)
+        expired = asyncio.Future(loop=self._loop)
+        replied = asyncio.Future(loop=self._loop)
+        later = asyncio.Future(loop=self._loop)
+        wheel.add(expired, 0.01)
+        wheel.add(replied, 0.01)
+        wheel.add(later, 10)
+        replied.set_result(42)
+
+        yield from asyncio.sleep(0.05, loop=self._loop)
+
+        with self.assertRaises(asyncio.TimeoutError):
+            expired.result()
+        self.assertEqual(42, replied.result())
+        self.assertFalse(later.done())
+        self.assertEqual(1, len(wheel))
+
+    @async_test
+    def test_drops_futures_as_they_complete(self):
+        wheel = TimeoutWheel(self._loop)
+        futures = [asyncio.Future(loop=self._loop) for _ in range(3)]
+        for future in futures:
+            wheel.add(future, 10)
+        futures[0].set_result(b'large reply')
+        futures[1].cancel()
+        yield from asyncio.sleep(0, loop=self._loop)
+
+        self.assertEqual(1, len(wheel))
+        futures[2].set_result(None)
+        yield from asyncio.sleep(0, loop=self._loop)
+        self.assertEqual({}, wheel._slots)
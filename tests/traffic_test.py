@@ -0,0 +1,40 @@
+import collections
+
+from beam_interactive2 import Connection
+from beam_interactive2.traffic import SyntheticTraffic, SyntheticSocket
+from ._util import AsyncTestCase, async_test
+
+
+class TestSyntheticTraffic(AsyncTestCase):
+
+    def test_leaves_only_present_participants(self):
+        traffic = SyntheticTraffic(participants=5, mix={
+            'onParticipantJoin': 1, 'onParticipantLeave': 1})
+        present = set(traffic.population)
+        for _ in range(200):
+            packet = traffic.next_packet()
+            for p in packet['params']['participants']:
+                if packet['method'] == 'onParticipantJoin':
+                    present.add(p['sessionID'])
+                else:
+                    present.remove(p['sessionID'])
+
+        self.assertEqual(present, set(traffic.population))
+
+    @async_test
+    def test_feeds_a_connection(self):
+        traffic = SyntheticTraffic(participants=10)
+        socket = SyntheticSocket(traffic, 50, batch=7, loop=self._loop)
+        connection = Connection(socket=socket, loop=self._loop)
+        yield from connection.connect()
+        yield from connection._recv_task
+
+        methods = collections.Counter()
+        while True:
+            call = connection.get_packet()
+            if call is None:
+                break
+            methods[call.name] += 1
+
+        self.assertEqual(50, sum(methods.values()))
+        self.assertGreater(methods['giveInput'], 0)